@@ -0,0 +1,100 @@
+# Init duration of the Lambda package: `import main` (module imports, template
+# compilation and SES client creation) in fresh interpreters, with the slowest
+# imports from python -X importtime. --baseline measures another git revision
+# the same way for a before/after comparison.
+#
+#   python benchmarks/bench_cold_start.py [--runs 10] [--baseline HEAD~1]
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INIT_SCRIPT = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(directory, runs):
+    # Returns (init durations in ms, {top-level module: [cumulative ms]})
+    env = dict(
+        os.environ,
+        # Lambda provides role credentials and the region through the environment
+        AWS_ACCESS_KEY_ID="benchmark",
+        AWS_SECRET_ACCESS_KEY="benchmark",
+        AWS_DEFAULT_REGION="ap-southeast-1",
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+    durations = []
+    modules = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", INIT_SCRIPT],
+            cwd=directory,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        durations.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+
+        # Modules imported directly by main, i.e. one level below it
+        for _, cumulative, indent, name in IMPORT_LINE.findall(result.stderr):
+            if len(indent) == 3:
+                modules.setdefault(name, []).append(int(cumulative) / 1000)
+
+    return durations, modules
+
+
+def checkout(revision, directory):
+    archive = os.path.join(directory, "tree.tar")
+    with open(archive, "wb") as output:
+        subprocess.run(
+            ["git", "archive", revision], cwd=ROOT, stdout=output, check=True
+        )
+    with tarfile.open(archive) as tree:
+        tree.extractall(directory)
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--baseline", help="git revision to compare against")
+    args = parser.parse_args()
+
+    trees = [("current", ROOT)]
+    with tempfile.TemporaryDirectory() as directory:
+        if args.baseline:
+            trees.insert(0, (args.baseline, checkout(args.baseline, directory)))
+
+        results = [(label, *measure(tree, args.runs)) for label, tree in trees]
+
+    for label, durations, modules in results:
+        print(
+            f"{label}: init median {statistics.median(durations):.1f} ms, "
+            f"min {min(durations):.1f} ms over {len(durations)} runs"
+        )
+        slowest = sorted(
+            modules.items(), key=lambda item: statistics.median(item[1]), reverse=True
+        )
+        for name, times in slowest[: args.top]:
+            print(f"  {name:<24} {statistics.median(times):>8.1f} ms")
+
+    if len(results) == 2:
+        before = statistics.median(results[0][1])
+        after = statistics.median(results[1][1])
+        print(f"init change: {after - before:+.1f} ms ({after / before - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Per-recipient cost of building a send request: SendEmail with rendered
+# bodies, SendRawEmail with a message built by the email package, and
+# SendRawEmail with the pre-encoded RawMessageTemplate. Each case includes
+# botocore's request serialization but no network call.
+#
+#   python benchmarks/bench_raw_mime.py [--seconds 1.0]
+
+import argparse
+import email
+import email.policy
+import os
+import sys
+import time
+from urllib.parse import urlencode
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import botocore.session
+from botocore.serialize import create_serializer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from raw_mime import RawMessageTemplate  # noqa: E402
+from template import bind_scholarship, template, template_plain_text  # noqa: E402
+
+SENDER = "no-reply@eduvision.live"
+SCHOLARSHIP_ARGS = (
+    "Techno Digital",
+    "October 11, 2025",
+    "https://www.aupp.edu.kh/scholarships/techno-digital",
+    2025,
+)
+SUBJECT = "🚨 URGENT: Techno Digital - Deadline in 3 Days"
+RECIPIENT = ("Keanghok", "keanghok@example.com")
+
+
+def builds_per_second(build, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(20):
+            build()
+        count += 20
+
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    service_model = botocore.session.get_session().get_service_model("ses")
+    serializer = create_serializer(service_model.metadata["protocol"])
+
+    def serialize(operation, params):
+        request = serializer.serialize_to_request(
+            params, service_model.operation_model(operation)
+        )
+        # The query protocol form-encodes the body before it is sent
+        return len(urlencode(request["body"]))
+
+    html, text = bind_scholarship(*SCHOLARSHIP_ARGS)
+    raw_message = RawMessageTemplate(SENDER, SUBJECT, text, html)
+    name, address = RECIPIENT
+
+    def send_email():
+        return serialize(
+            "SendEmail",
+            {
+                "Source": SENDER,
+                "Destination": {"ToAddresses": [address]},
+                "Message": {
+                    "Subject": {"Data": SUBJECT, "Charset": "UTF-8"},
+                    "Body": {
+                        "Text": {"Data": text.render(name), "Charset": "UTF-8"},
+                        "Html": {"Data": html.render(name), "Charset": "UTF-8"},
+                    },
+                },
+            },
+        )
+
+    def email_package():
+        message = MIMEMultipart("alternative")
+        message["Subject"] = SUBJECT
+        message["From"] = SENDER
+        message["To"] = address
+        message.attach(MIMEText(text.render(name), "plain", "utf-8"))
+        message.attach(MIMEText(html.render(name), "html", "utf-8"))
+        return serialize(
+            "SendRawEmail",
+            {
+                "Source": SENDER,
+                "Destinations": [address],
+                "RawMessage": {"Data": message.as_bytes()},
+            },
+        )
+
+    def pre_encoded():
+        return serialize(
+            "SendRawEmail",
+            {
+                "Source": SENDER,
+                "Destinations": [address],
+                "RawMessage": {"Data": raw_message.render([address], name)},
+            },
+        )
+
+    # The pre-encoded message must decode to exactly the rendered bodies
+    parsed = email.message_from_bytes(
+        raw_message.render([address], name), policy=email.policy.default
+    )
+    decoded = [part.get_content().replace("\r\n", "\n") for part in parsed.iter_parts()]
+    expected = [
+        template_plain_text(name, *SCHOLARSHIP_ARGS),
+        template(name, *SCHOLARSHIP_ARGS),
+    ]
+    if decoded != expected:
+        sys.exit("pre-encoded message does not decode to the rendered templates")
+
+    cases = [
+        ("SendEmail", send_email),
+        ("SendRawEmail (email pkg)", email_package),
+        ("SendRawEmail (pre-encoded)", pre_encoded),
+    ]
+
+    baseline = None
+    print(f"{'request':<28} {'builds/s':>10} {'body bytes':>11} {'speedup':>8}")
+    for label, build in cases:
+        size = build()
+        rate = builds_per_second(build, args.seconds)
+        baseline = baseline or rate
+        print(f"{label:<28} {rate:>10,.0f} {size:>11,} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Send throughput with one SES region against several. Each stubbed region
+# enforces its own MaxSendRate through the real rate limiter, so emails/sec is
+# bounded by the sum of the regions' rates. The last case has one region
+# throttling every send, to show the failover cost.
+#
+#   python benchmarks/bench_regions.py [--rate 50] [--regions 3]
+#       [--recipients 300] [--concurrency 16]
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SES_MAX_ATTEMPTS", "2")
+os.environ.setdefault("SES_RETRY_BASE_DELAY", "0.01")
+
+from botocore.exceptions import ClientError  # noqa: E402
+from bench_suite import StubSES, handler, recipient_rows  # noqa: E402
+import regions  # noqa: E402
+
+
+class ThrottledStubSES(StubSES):
+    # A region whose sending rate is exhausted by someone else
+    def send_email(self, **kwargs):
+        raise ClientError(
+            {
+                "Error": {
+                    "Code": "Throttling",
+                    "Message": "Maximum sending rate exceeded.",
+                },
+                "ResponseMetadata": {"HTTPStatusCode": 400},
+            },
+            "SendEmail",
+        )
+
+
+# Rate limiters and quotas are cached per region name, so every case gets
+# fresh names and starts with a full token bucket
+_case = itertools.count()
+
+
+def run_case(clients, recipients, concurrency):
+    regions.set_region_pool(clients)
+    handler.get_idempotency_store().entries.clear()
+    body = json.dumps({"data": recipient_rows(recipients), "concurrency": concurrency})
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = handler.lambda_handler({"body": body}, None)
+    elapsed = time.perf_counter() - started
+
+    summary = json.loads(response["body"])["summary"]
+    return summary["successful"] / elapsed, summary
+
+
+def stubs(count, rate, throttled=0):
+    case = next(_case)
+    return [
+        (ThrottledStubSES if i < throttled else StubSES)(
+            region_name=f"case{case}-region{i}", max_send_rate=rate
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--regions", type=int, default=3)
+    parser.add_argument("--recipients", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(
+        f"{args.recipients} recipients, MaxSendRate {args.rate:g}/s per region, "
+        f"concurrency {args.concurrency}"
+    )
+    cases = [
+        (f"{n} region(s)", stubs(n, args.rate)) for n in range(1, args.regions + 1)
+    ]
+    if args.regions > 1:
+        cases.append(
+            (
+                f"{args.regions} regions, 1 throttled",
+                stubs(args.regions, args.rate, throttled=1),
+            )
+        )
+
+    for name, clients in cases:
+        rate, summary = run_case(clients, args.recipients, args.concurrency)
+        print(
+            f"{name:<28} {rate:>8,.1f} emails/sec  "
+            f"({summary['successful']} sent, {summary['failed']} failed)"
+        )
+
+
+if __name__ == "__main__":
+    main()
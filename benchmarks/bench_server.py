@@ -0,0 +1,146 @@
+# Load test for server.py: keep-alive clients post scholarship batches to an
+# in-process server backed by a stubbed SES client with a simulated network
+# latency, and requests/sec and latency percentiles are reported.
+#
+#   python benchmarks/bench_server.py [--connections 32] [--seconds 5]
+#       [--recipients 10] [--ses-latency-ms 20] [--workers 32]
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import StubSES, recipient_rows  # noqa: E402
+import regions  # noqa: E402
+import server  # noqa: E402
+
+
+class SlowStubSES(StubSES):
+    # StubSES with a fixed round trip, which is what the worker threads overlap
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def send_email(self, **kwargs):
+        time.sleep(self.latency)
+        return super().send_email(**kwargs)
+
+
+async def client(host, port, bodies, stop_at, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_at:
+            body = next(bodies)
+            started = time.perf_counter()
+            writer.write(
+                (
+                    "POST / HTTP/1.1\r\nHost: bench\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":", 1)[1])
+                for line in head.split(b"\r\n")
+                if line.lower().startswith(b"content-length:")
+            )
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - started) * 1000)
+            status_code = int(head.split(b" ", 2)[1])
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load(host, port, connections, seconds, recipients):
+    # Every request has new addresses, so none is skipped as already sent
+    emails = itertools.count()
+
+    def bodies():
+        while True:
+            rows = recipient_rows(recipients)
+            for row in rows:
+                row["email"] = f"student{next(emails)}@example.com"
+            yield json.dumps({"data": rows}).encode("utf-8")
+
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(host, port, bodies(), started + seconds, latencies, statuses)
+            for _ in range(connections)
+        )
+    )
+    return time.perf_counter() - started, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--recipients", type=int, default=10)
+    parser.add_argument("--ses-latency-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=server.SERVER_WORKERS)
+    args = parser.parse_args()
+
+    regions.set_region_pool([SlowStubSES(args.ses_latency_ms / 1000)])
+    app = server.HandlerServer(workers=args.workers)
+
+    # The server gets its own loop and thread, as it would in its own process
+    address = []
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(
+                app.serve(
+                    "127.0.0.1",
+                    0,
+                    ready=lambda name: (address.extend(name), ready.set()),
+                )
+            )
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+
+    # Per-invocation log and metrics lines would swamp the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, latencies, statuses = asyncio.run(
+            load(*address[:2], args.connections, args.seconds, args.recipients)
+        )
+
+    latencies.sort()
+    print(
+        f"{len(latencies)} requests over {args.connections} keep-alive connections "
+        f"in {elapsed:.1f} s, {args.recipients} recipients each, "
+        f"SES latency {args.ses_latency_ms:g} ms, {args.workers} workers"
+    )
+    print(f"requests/sec     {len(latencies) / elapsed:>10,.1f}")
+    print(f"emails/sec       {len(latencies) * args.recipients / elapsed:>10,.1f}")
+    print(f"latency p50      {statistics.median(latencies):>10.1f} ms")
+    print(f"latency p95      {latencies[int(0.95 * (len(latencies) - 1))]:>10.1f} ms")
+    print(f"latency p99      {latencies[int(0.99 * (len(latencies) - 1))]:>10.1f} ms")
+    print(
+        "status codes     "
+        + ", ".join(f"{code}: {n}" for code, n in sorted(statuses.items()))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# Offline benchmark suite: template renders, deadline parsing, recipient
+# validation, JSON parse/serialize of N-recipient bodies and end-to-end
+# lambda_handler latency against a stubbed SES client. Results are written as
+# JSON so runs can be compared.
+#
+#   python benchmarks/bench_suite.py [--seconds 0.5] [--output results.json]
+#   python benchmarks/bench_suite.py --compare baseline.json [--threshold 0.1]
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline: the client is never used for a real request, and sends are
+# remembered in memory so every iteration can be reset
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+os.environ["IDEMPOTENCY_STORE"] = "memory://"
+
+import main as handler  # noqa: E402
+import recipients  # noqa: E402
+import regions  # noqa: E402
+import template  # noqa: E402
+from results import ResultCollector, SendResult  # noqa: E402
+
+SCHOLARSHIP_ARGS = (
+    "Keanghok",
+    "Techno Digital",
+    "October 11, 2025",
+    "https://www.aupp.edu.kh/scholarships/techno-digital",
+    2025,
+)
+
+
+class StubSES:
+    # Answers the SES calls the handler makes without any network or sleep
+    def __init__(self, region_name="benchmark", max_send_rate=1e9):
+        self.meta = type("Meta", (), {"region_name": region_name})()
+        self.max_send_rate = max_send_rate
+        self.message_ids = itertools.count()
+        self.templates = {}
+
+    def get_send_quota(self):
+        return {
+            "Max24HourSend": -1,
+            "MaxSendRate": self.max_send_rate,
+            "SentLast24Hours": 0,
+        }
+
+    def send_email(self, **kwargs):
+        return {"MessageId": f"stub-{next(self.message_ids)}"}
+
+    def send_raw_email(self, **kwargs):
+        return {"MessageId": f"stub-{next(self.message_ids)}"}
+
+    def get_template(self, TemplateName):
+        return {"Template": self.templates.setdefault(TemplateName, {})}
+
+    def send_bulk_templated_email(self, Destinations, **kwargs):
+        return {
+            "Status": [
+                {"Status": "Success", "MessageId": f"stub-{next(self.message_ids)}"}
+                for _ in Destinations
+            ]
+        }
+
+
+def recipient_rows(count):
+    return [
+        {
+            "name": f"Student {i}",
+            "email": f"student{i}@example.com",
+            "scholarship_name": "Techno Digital",
+            "deadline": "2025-10-11",
+            "apply_link": "https://www.aupp.edu.kh/scholarships/techno-digital",
+        }
+        for i in range(count)
+    ]
+
+
+def throughput(call, seconds, rounds=3):
+    # Best calls per second of a few rounds, which filters out most noise from
+    # other processes
+    rates = []
+    for _ in range(rounds):
+        count = 0
+        started = time.perf_counter()
+        while True:
+            for _ in range(10):
+                call()
+            count += 10
+            elapsed = time.perf_counter() - started
+            if elapsed >= seconds / rounds:
+                rates.append(count / elapsed)
+                break
+
+    return {"value": max(rates), "unit": "ops/s"}
+
+
+def latency(call, seconds, setup=None):
+    # Per-call latency percentiles in milliseconds
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(samples) < 5:
+        if setup:
+            setup()
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    samples.sort()
+    return {
+        "value": statistics.median(samples),
+        "unit": "ms",
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+        "samples": len(samples),
+    }
+
+
+def handler_case(body, headers=None):
+    event = {"body": body, "headers": headers or {}}
+
+    def reset():
+        # Otherwise every later iteration is "Already sent"
+        handler.get_idempotency_store().entries.clear()
+
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = handler.lambda_handler(event, None)
+        if response["statusCode"] != 200:
+            sys.exit(f"handler returned {response['statusCode']}: {response['body']}")
+
+    return call, reset
+
+
+def run_suite(seconds, sizes):
+    results = {}
+
+    results["render.template"] = throughput(
+        lambda: template.template(*SCHOLARSHIP_ARGS), seconds
+    )
+    results["render.template_plain_text"] = throughput(
+        lambda: template.template_plain_text(*SCHOLARSHIP_ARGS), seconds
+    )
+
+    results["deadline.format_cached"] = throughput(
+        lambda: recipients.format_deadline("2025-10-11"), seconds
+    )
+    parse = recipients._format_date_string.__wrapped__
+    results["deadline.parse_uncached"] = throughput(
+        lambda: parse("2025-10-11"), seconds
+    )
+
+    for count in sizes:
+        rows = recipient_rows(count)
+        body = json.dumps({"data": rows})
+        results[f"recipients.normalize.{count}"] = throughput(
+            lambda: recipients.normalize_recipients(enumerate(rows)), seconds
+        )
+        results[f"json.parse_body.{count}"] = throughput(
+            lambda: json.loads(body), seconds
+        )
+
+        sent = [
+            SendResult(i, row["name"], row["email"], "success", f"stub-{i}", None, 1)
+            for i, row in enumerate(rows)
+        ]
+
+        def serialize():
+            collector = ResultCollector("full")
+            collector.extend(sent)
+            handler.summary_response(collector)
+
+        results[f"json.serialize_response.{count}"] = throughput(serialize, seconds)
+
+    regions.set_region_pool([StubSES()])
+    for count in sizes:
+        rows = recipient_rows(count)
+        for delivery in handler.DELIVERY_MODES:
+            call, reset = handler_case(json.dumps({"data": rows, "delivery": delivery}))
+            results[f"handler.{delivery}.{count}"] = latency(call, seconds, reset)
+
+        ndjson = "\n".join(json.dumps(row) for row in rows)
+        call, reset = handler_case(ndjson, {"Content-Type": "application/x-ndjson"})
+        results[f"handler.ndjson.{count}"] = latency(call, seconds, reset)
+
+        # Each address has three scholarships, so digests need a third of the sends
+        digest_rows = [
+            dict(
+                row,
+                email=f"student{i // 3}@example.com",
+                deadline=f"2025-10-{i % 3 + 11}",
+            )
+            for i, row in enumerate(rows)
+        ]
+        call, reset = handler_case(json.dumps({"data": digest_rows, "digest": True}))
+        results[f"handler.digest.{count}"] = latency(call, seconds, reset)
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, threshold):
+    # Returns the names of metrics that got worse by more than threshold
+    regressions = []
+    print(f"{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        # Positive is faster: more ops/s, or fewer ms
+        if result["unit"] == "ms":
+            change = before["value"] / result["value"] - 1
+        else:
+            change = result["value"] / before["value"] - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  regression"
+        print(
+            f"{name:<36} {before['value']:>12,.2f} {result['value']:>12,.2f} "
+            f"{change:>+7.0%}{flag}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=0.5)
+    parser.add_argument("--sizes", default="1,100,1000")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fractional slowdown reported as a regression (exit status 1)",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run_suite(args.seconds, sizes)
+
+    for name, result in results.items():
+        extra = f"  p95 {result['p95_ms']:.2f} ms" if "p95_ms" in result else ""
+        print(f"{name:<36} {result['value']:>14,.2f} {result['unit']}{extra}")
+
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "seconds": args.seconds,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            regressions = compare(
+                json.load(baseline)["results"], results, args.threshold
+            )
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
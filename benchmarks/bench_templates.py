@@ -0,0 +1,104 @@
+# Renders/sec of the compiled templates against the original f-string functions.
+# Both render the sources as written, before html_optimizer minifies them.
+#
+#   python benchmarks/bench_templates.py [--seconds 1.0]
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "mail_verify"))
+
+import template  # noqa: E402
+import templates  # noqa: E402
+from compiled_template import CompiledTemplate  # noqa: E402
+
+SCHOLARSHIP_ARGS = (
+    "Keanghok",
+    "Techno Digital",
+    "October 11, 2025",
+    "https://www.aupp.edu.kh/scholarships/techno-digital",
+    2025,
+)
+VERIFY_ARGS = ("Keanghok", "https://eduvision.live/verify?token=abc123", 2025)
+
+
+def fstring_function(source, params):
+    # Rebuild the pre-compilation implementation: one f-string per call
+    namespace = {}
+    exec(f"def render({', '.join(params)}):\n    return f{source!r}\n", namespace)
+    return namespace["render"]
+
+
+def renders_per_second(render, args, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            render(*args)
+        count += 100
+
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    scholarship_params = (
+        "name",
+        "scholarship_name",
+        "friendly_deadline",
+        "apply_link",
+        "year",
+    )
+    cases = [
+        (
+            "template",
+            CompiledTemplate(template.HTML_SOURCE, scholarship_params).render,
+            fstring_function(template.HTML_SOURCE, scholarship_params),
+            SCHOLARSHIP_ARGS,
+        ),
+        (
+            "template_plain_text",
+            template.template_plain_text,
+            fstring_function(template.TEXT_SOURCE, scholarship_params),
+            SCHOLARSHIP_ARGS,
+        ),
+        (
+            "verify_email_template",
+            CompiledTemplate(
+                templates.VERIFY_HTML_SOURCE, ("name", "verify_link", "year")
+            ).render,
+            fstring_function(
+                templates.VERIFY_HTML_SOURCE, ("name", "verify_link", "year")
+            ),
+            VERIFY_ARGS,
+        ),
+        (
+            "verify_template_plain_text",
+            templates.template_plain_text,
+            fstring_function(templates.VERIFY_TEXT_SOURCE, ("name", "verify_link")),
+            VERIFY_ARGS[:2],
+        ),
+    ]
+
+    print(f"{'template':<28} {'f-string/s':>12} {'compiled/s':>12} {'speedup':>8}")
+    for name, compiled, legacy, call_args in cases:
+        if compiled(*call_args) != legacy(*call_args):
+            sys.exit(f"{name}: compiled output differs from the f-string output")
+
+        legacy_rate = renders_per_second(legacy, call_args, args.seconds)
+        compiled_rate = renders_per_second(compiled, call_args, args.seconds)
+        print(
+            f"{name:<28} {legacy_rate:>12,.0f} {compiled_rate:>12,.0f} "
+            f"{compiled_rate / legacy_rate:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
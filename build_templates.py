@@ -0,0 +1,89 @@
+# Build step: minifies the HTML templates, inlines their CSS and writes the
+# results to optimized_templates.json, which is shipped in the Lambda zips so
+# nothing is optimized at import time. Prints the bytes saved per email.
+#
+#   python build_templates.py [--check]
+
+import argparse
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "mail_verify"))
+
+import html_optimizer  # noqa: E402
+import template  # noqa: E402, F401
+import templates  # noqa: E402, F401
+import send_template  # noqa: E402, F401
+from compiled_template import CompiledTemplate  # noqa: E402
+
+
+def structure(document):
+    # Tags and their attributes other than style, in document order
+    return [
+        re.sub(r'\sstyle="[^"]*"', "", tag)
+        for tag in re.findall(
+            r"<(?!!)[^>]*>", re.sub(r"<!--.*?-->", "", document, flags=re.S)
+        )
+        if not tag.startswith("</")
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="fail if optimized_templates.json is out of date instead of writing it",
+    )
+    args = parser.parse_args()
+
+    artifacts = {}
+    rows = []
+    registered = sorted(html_optimizer.registered_templates().items())
+    for name, (original, _, stylesheet) in registered:
+        optimized = CompiledTemplate(
+            html_optimizer.optimize_source(original, stylesheet), original.fields
+        )
+
+        # Same text and elements, only whitespace, comments and styles moved
+        before = original.render(*original.fields)
+        after = optimized.render(*original.fields)
+        if html_optimizer.visible_text(before) != html_optimizer.visible_text(after):
+            sys.exit(f"{name}: optimized template changes the visible text")
+        if [t for t in structure(before) if not t.startswith("<style")] != [
+            t for t in structure(after) if not t.startswith("<style")
+        ]:
+            sys.exit(f"{name}: optimized template changes the markup")
+
+        artifacts[html_optimizer.artifact_key(original.source, stylesheet)] = (
+            optimized.source
+        )
+        rows.append((name, len(before.encode("utf-8")), len(after.encode("utf-8"))))
+
+    print(f"{'template':<24} {'original':>9} {'optimized':>10} {'saved/email':>12}")
+    for name, before, after in rows:
+        print(
+            f"{name:<24} {before:>9,} {after:>10,} "
+            f"{before - after:>6,} ({(before - after) / before:.0%})"
+        )
+
+    content = json.dumps(artifacts, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.check:
+        try:
+            with open(html_optimizer.ARTIFACTS_PATH, encoding="utf-8") as current:
+                if current.read() == content + "\n":
+                    return
+        except OSError:
+            pass
+        sys.exit(f"{html_optimizer.ARTIFACTS_PATH} is out of date")
+
+    with open(html_optimizer.ARTIFACTS_PATH, "w", encoding="utf-8") as output:
+        output.write(content + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+import log_buffer
+import metrics
+from template import template_plain_text, template
+from rate_limiter import record_sent, wait_for_token
+from retry import call_with_retry
+from regions import region_name, should_fail_over
+from results import SendResult
+
+# SES accepts at most 50 destinations per SendBulkTemplatedEmail call
+MAX_BULK_DESTINATIONS = 50
+
+TEMPLATE_PREFIX = "scholarship-reminder"
+SUBJECT = "🚨 URGENT: {{scholarship_name}} - Deadline in 3 Days"
+
+# (region, template name) pairs already confirmed in SES by this warm container
+_registered = set()
+_lock = threading.Lock()
+
+
+# Built once per container; every chunk and region uses the same template
+@lru_cache(maxsize=1)
+def build_stored_template():
+    # Render the regular templates with SES placeholders in every slot
+    placeholders = (
+        "{{name}}",
+        "{{scholarship_name}}",
+        "{{deadline}}",
+        "{{apply_link}}",
+        "{{year}}",
+    )
+    html_part = template(*placeholders)
+    text_part = template_plain_text(*placeholders)
+
+    # The content hash is part of the name, so edits upload a new template
+    digest = hashlib.sha256(
+        "\0".join((SUBJECT, html_part, text_part)).encode("utf-8")
+    ).hexdigest()[:16]
+
+    return {
+        "TemplateName": f"{TEMPLATE_PREFIX}-{digest}",
+        "SubjectPart": SUBJECT,
+        "HtmlPart": html_part,
+        "TextPart": text_part,
+    }
+
+
+def ensure_stored_template(ses_client):
+    stored_template = build_stored_template()
+    template_name = stored_template["TemplateName"]
+    # Templates are stored per region
+    key = (region_name(ses_client), template_name)
+
+    with _lock:
+        if key in _registered:
+            return template_name
+
+    try:
+        ses_client.get_template(TemplateName=template_name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "TemplateDoesNotExist":
+            raise
+        try:
+            ses_client.create_template(Template=stored_template)
+            log_buffer.info("📄 Registered SES template %s", template_name)
+        except ClientError as e:
+            # Another container may have uploaded it first
+            if e.response["Error"]["Code"] != "AlreadyExists":
+                raise
+
+    with _lock:
+        _registered.add(key)
+
+    return template_name
+
+
+def send_bulk_templated(pool, sender, recipients, year, concurrency=1, stop_at=None):
+    # recipients are dicts with index, name, email, scholarship_name,
+    # friendly_deadline and apply_link; results come back in the same order
+    if not recipients:
+        return []
+
+    chunks = [
+        recipients[start : start + MAX_BULK_DESTINATIONS]
+        for start in range(0, len(recipients), MAX_BULK_DESTINATIONS)
+    ]
+
+    def send_chunk(chunk):
+        # Chunks are not started once the time budget is spent
+        if stop_at is not None and time.monotonic() >= stop_at:
+            return [SendResult.for_recipient(r, "pending") for r in chunk]
+
+        # Each chunk goes to one region; a region that throttles or errors is
+        # cooled down and the chunk is sent through the next one
+        ses_client = pool.pick()
+        tried = []
+        while True:
+            tried.append(ses_client)
+            fail_over = len(tried) < len(pool)
+            try:
+                template_name = ensure_stored_template(ses_client)
+                return _send_chunk(
+                    ses_client, sender, template_name, chunk, year, stop_at, fail_over
+                )
+            except Exception as e:
+                out_of_time = stop_at is not None and time.monotonic() >= stop_at
+                if not (fail_over and should_fail_over(e)) or out_of_time:
+                    raise
+                pool.mark_failed(ses_client)
+                metrics.count("Failovers")
+                log_buffer.debug(
+                    "↪️ Failing over %d recipients from %s: %s",
+                    len(chunk),
+                    region_name(ses_client),
+                    e,
+                )
+                ses_client = pool.pick(exclude=tried)
+
+    if concurrency <= 1 or len(chunks) <= 1:
+        chunk_results = [send_chunk(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+            chunk_results = list(metrics.context_map(executor, send_chunk, chunks))
+
+    return [result for results in chunk_results for result in results]
+
+
+def _send_chunk(
+    ses_client, sender, template_name, chunk, year, stop_at=None, fail_over=False
+):
+    # With fail_over, errors another region might not have are raised instead
+    # SES renders the stored template, so per-recipient data is the only render
+    with metrics.timer("render"):
+        destinations = [
+            {
+                "Destination": {"ToAddresses": [recipient["email"]]},
+                "ReplacementTemplateData": json.dumps(
+                    {
+                        "name": recipient["name"],
+                        "scholarship_name": recipient["scholarship_name"],
+                        "deadline": recipient["friendly_deadline"],
+                        "apply_link": recipient["apply_link"],
+                        "year": year,
+                    }
+                ),
+            }
+            for recipient in chunk
+        ]
+
+    def send():
+        with metrics.timer("rate_limit"):
+            wait_for_token(ses_client, len(chunk))
+        with metrics.ses_call():
+            return ses_client.send_bulk_templated_email(
+                Source=sender,
+                Template=template_name,
+                DefaultTemplateData=json.dumps(
+                    {
+                        "name": "Student",
+                        "scholarship_name": "Scholarship Program",
+                        "deadline": "",
+                        "apply_link": "https://eduvision.live",
+                        "year": year,
+                    }
+                ),
+                Destinations=destinations,
+            )
+
+    try:
+        response, attempts = call_with_retry(send, stop_at)
+    except ClientError as e:
+        if fail_over and should_fail_over(e):
+            raise
+        log_buffer.record_failed(e.response["Error"]["Code"], len(chunk))
+        log_buffer.debug(
+            "❌ Error sending bulk email to %d recipients: %s: %s",
+            len(chunk),
+            e.response["Error"]["Code"],
+            e.response["Error"]["Message"],
+        )
+        return [
+            _result(
+                recipient, "failed", e.attempts, error=e.response["Error"]["Message"]
+            )
+            for recipient in chunk
+        ]
+    except Exception as e:
+        # Connection errors that outlasted the retries
+        if fail_over and should_fail_over(e):
+            raise
+        log_buffer.record_failed(type(e).__name__, len(chunk))
+        log_buffer.debug(
+            "❌ Error sending bulk email to %d recipients: %s", len(chunk), e
+        )
+        return [
+            _result(recipient, "failed", getattr(e, "attempts", 1), error=str(e))
+            for recipient in chunk
+        ]
+
+    log_buffer.debug("✅ Bulk email sent to %d recipients", len(chunk))
+    record_sent(
+        ses_client,
+        sum(status.get("Status") == "Success" for status in response["Status"]),
+    )
+
+    # Status entries are returned in the same order as Destinations
+    results = []
+    for recipient, status in zip(chunk, response["Status"]):
+        if status.get("Status") == "Success":
+            log_buffer.record_sent()
+            results.append(
+                _result(recipient, "success", attempts, message_id=status["MessageId"])
+            )
+        else:
+            log_buffer.record_failed(status.get("Status") or "Failed")
+            log_buffer.debug(
+                "❌ Error sending bulk email to %s: %s",
+                recipient["email"],
+                status.get("Error") or status.get("Status"),
+            )
+            results.append(
+                _result(
+                    recipient,
+                    "failed",
+                    attempts,
+                    error=status.get("Error") or status.get("Status"),
+                )
+            )
+
+    return results
+
+
+def _result(recipient, status, attempts, message_id=None, error=None):
+    return SendResult.for_recipient(
+        recipient, status, message_id=message_id, error=error, attempts=attempts
+    )
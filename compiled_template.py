@@ -0,0 +1,70 @@
+from string import Formatter
+
+
+class CompiledTemplate:
+    # Splits a str.format-style source into static segments and named slots
+    # once at import time. Rendering goes through a function generated from
+    # those segments, so each call is a single string build with no parsing.
+
+    def __init__(self, source, fields=None):
+        self.source = source
+        self.segments = []
+        self.slots = []
+
+        # Formatter yields a new literal at every escaped brace, so adjacent
+        # literals are merged to keep one static segment between slots
+        static = ""
+        for literal, field, _, _ in Formatter().parse(source):
+            static += literal
+            if field is not None:
+                if not field.isidentifier():
+                    raise ValueError(f"Unsupported template slot: {{{field}}}")
+                self.segments.append(static)
+                self.slots.append((len(self.segments), field))
+                self.segments.append("")
+                static = ""
+        self.segments.append(static)
+
+        # Positional order of render(); defaults to order of first appearance
+        slot_names = tuple(dict.fromkeys(field for _, field in self.slots))
+        self.fields = tuple(fields) if fields else slot_names
+        if set(self.fields) != set(slot_names):
+            raise ValueError(f"Template slots {slot_names} do not match {self.fields}")
+        self.render = self._compile()
+
+    def partial(self, **values):
+        # Bake some slots into the static markup and return a template that
+        # only takes the remaining fields, in their original order
+        remaining = tuple(field for field in self.fields if field not in values)
+        return CompiledTemplate(self._format_source(values), remaining)
+
+    def _format_source(self, values=None):
+        # Rebuild a str.format source, substituting any slot found in values
+        values = values or {}
+        slot_fields = dict(self.slots)
+        parts = []
+        for position, segment in enumerate(self.segments):
+            field = slot_fields.get(position)
+            if field is None:
+                parts.append(_escape(segment))
+            elif field in values:
+                parts.append(_escape(format(values[field])))
+            else:
+                parts.append("{" + field + "}")
+
+        return "".join(parts)
+
+    def _compile(self):
+        # A generated f-string is CPython's fastest way to join the segments
+        # with formatted slot values, and matches the original output exactly
+        body = self._format_source()
+        namespace = {}
+        exec(
+            f"def render({', '.join(self.fields)}):\n    return f{body!r}\n",
+            namespace,
+        )
+        return namespace["render"]
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
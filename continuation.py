@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import json
+from bisect import bisect_right
+
+TOKEN_VERSION = 1
+
+
+class PayloadFingerprint:
+    # Hash of the recipient rows, so a continuation token is only honoured for
+    # the payload it was issued for
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+
+    def update(self, row):
+        self.digest.update(
+            json.dumps(row, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        )
+        self.digest.update(b"\n")
+
+    def hexdigest(self):
+        return self.digest.hexdigest()[:32]
+
+
+class IndexRanges:
+    # Sorted, non-overlapping [start, end] index ranges with O(log n) lookup.
+    # With after set, every index from after on is included as well.
+
+    def __init__(self, ranges, after=None):
+        self.ranges = sorted(ranges)
+        self.starts = [start for start, _ in self.ranges]
+        self.after = after
+
+    def __contains__(self, index):
+        if self.after is not None and index >= self.after:
+            return True
+        position = bisect_right(self.starts, index) - 1
+        return position >= 0 and index <= self.ranges[position][1]
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end in self.ranges)
+
+    @classmethod
+    def from_indexes(cls, indexes):
+        ranges = []
+        for index in sorted(indexes):
+            if ranges and index == ranges[-1][1] + 1:
+                ranges[-1][1] = index
+            else:
+                ranges.append([index, index])
+        return cls(ranges)
+
+
+def encode_token(pending_indexes, fingerprint, rows=None):
+    # With rows set, the fingerprint covers only the first rows rows and every
+    # row from there on is pending, e.g. the rest of a stream that stopped at
+    # a row that could not be parsed
+    ranges = IndexRanges.from_indexes(pending_indexes).ranges
+    token = {"v": TOKEN_VERSION, "fp": fingerprint, "pending": ranges}
+    if rows is not None:
+        token["rows"] = rows
+    payload = json.dumps(token, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token):
+    # Returns (IndexRanges of unsent rows, payload fingerprint, number of rows
+    # the fingerprint covers or None for all of them)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        if payload["v"] != TOKEN_VERSION:
+            raise ValueError("unsupported version")
+        ranges = [(int(start), int(end)) for start, end in payload["pending"]]
+        rows = payload.get("rows")
+        rows = None if rows is None else int(rows)
+        return IndexRanges(ranges, after=rows), payload["fp"], rows
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid continuation token: {e}") from e
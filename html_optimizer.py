@@ -0,0 +1,555 @@
+import hashlib
+import html
+import json
+import os
+import re
+from compiled_template import CompiledTemplate, _escape
+
+# Set to 0 to send the HTML templates exactly as written
+OPTIMIZE_TEMPLATES = os.getenv("OPTIMIZE_TEMPLATES", "1") != "0"
+
+# Optimized sources written by build_templates.py; any template missing from
+# it (or changed since) is optimized at import time instead
+ARTIFACTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "optimized_templates.json"
+)
+
+# Part of the artifact key, so optimizer changes invalidate old artifacts
+OPTIMIZER_VERSION = 1
+
+# Tags whose surrounding whitespace never renders
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "style",
+    "script", "div", "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol",
+    "li", "table", "thead", "tbody", "tfoot", "tr", "td", "th", "br", "hr",
+    "center", "blockquote", "section", "header", "footer", "article", "nav",
+}  # fmt: skip
+VOID_TAGS = {"meta", "link", "img", "br", "hr", "input", "base", "col", "source"}
+RAW_TEXT_TAGS = {"style", "script", "title", "textarea", "pre"}
+# Elements that never render, so styles are not inlined into them
+HEAD_TAGS = {"head", "meta", "title", "style", "link", "script", "base"}
+
+_TOKEN = re.compile(
+    r"<!--.*?-->|<![^>]*>|</?[a-zA-Z](?:[^>\"']|\"[^\"]*\"|'[^']*')*>|[^<]+|<",
+    re.S,
+)
+_TAG = re.compile(r"<(/?)([a-zA-Z][\w-]*)(.*?)/?>$", re.S)
+_ATTRIBUTE = re.compile(r"([^\s=/>]+)(?:\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s>]+))?")
+_WHITESPACE = re.compile(r"[ \t\r\n\f]+")
+_STRING = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')")
+_COMPOUND = re.compile(r"(\*|[a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$")
+_IMPORTANT = re.compile(r"\s*!\s*important\s*$", re.I)
+
+_artifacts = None
+_optimized = {}
+
+
+def optimize_template(name, compiled, stylesheet=None):
+    # Returns the minified, CSS-inlined version of an HTML CompiledTemplate and
+    # records both for build_templates.py's report. A fragment that is rendered
+    # into a page passes that page's <style> element as stylesheet.
+    optimized = compiled
+    if OPTIMIZE_TEMPLATES:
+        source = _load_artifacts().get(artifact_key(compiled.source, stylesheet))
+        if source is None:
+            source = optimize_source(compiled, stylesheet)
+        optimized = CompiledTemplate(source, compiled.fields)
+
+    _optimized[name] = (compiled, optimized, stylesheet)
+    return optimized
+
+
+def registered_templates():
+    return dict(_optimized)
+
+
+def artifact_key(source, stylesheet=None):
+    if stylesheet is not None:
+        source = f"{stylesheet}\0{source}"
+    return hashlib.sha256(f"{OPTIMIZER_VERSION}\0{source}".encode("utf-8")).hexdigest()
+
+
+def optimize_source(compiled, stylesheet=None):
+    # Slots are rendered as NUL-delimited markers, so the optimizer sees plain
+    # HTML, then turned back into {field} slots
+    markers = [f"\0{position}\0" for position in range(len(compiled.fields))]
+    document = compiled.render(*markers)
+    if stylesheet is None:
+        optimized = _escape(optimize_html(document))
+    else:
+        # Only the inlined styles are kept; the rules left in <style> apply
+        # through the page's own stylesheet
+        optimized = optimize_html(stylesheet + document)
+        optimized = _escape(optimized[optimized.index("</style>") + len("</style>") :])
+    for marker, field in zip(markers, compiled.fields):
+        optimized = optimized.replace(marker, "{" + field + "}")
+
+    return optimized
+
+
+def optimize_html(document):
+    tokens = [_parse_token(token) for token in _tokenize(document)]
+
+    # Inline every rule a plain selector can express; the rest stays in <style>
+    stylesheets = [t for t in tokens if t["kind"] == "raw" and t["tag"] == "style"]
+    rules = []
+    for stylesheet in stylesheets:
+        retained, inlined = _split_rules(parse_css(stylesheet["text"]))
+        rules.extend(inlined)
+        stylesheet["text"] = serialize_css(retained)
+    _inline_styles(tokens, rules)
+
+    return _serialize_tokens(tokens)
+
+
+def minify_css(css):
+    return serialize_css(parse_css(css))
+
+
+def parse_css(css):
+    # Returns [(kind, prelude, body)] where kind is "statement" (@import ...;),
+    # "rule" (body is a list of declarations) or "block" (@media, nested items)
+    items, _ = _parse_items(_strip_comments(css), 0)
+    return items
+
+
+def serialize_css(items):
+    parts = []
+    for kind, prelude, body in items:
+        if kind == "statement":
+            parts.append(_minify_prelude(prelude) + ";")
+        elif kind == "block":
+            parts.append(_minify_prelude(prelude) + "{" + serialize_css(body) + "}")
+        elif body:
+            parts.append(
+                _minify_selectors(prelude) + "{" + _serialize_declarations(body) + "}"
+            )
+
+    return "".join(parts)
+
+
+def parse_declarations(text):
+    # [(property, value, important)] in source order
+    declarations = []
+    for declaration in _split_outside(text, ";"):
+        name, _, value = declaration.partition(":")
+        if not value.strip():
+            continue
+        important = bool(_IMPORTANT.search(value))
+        value = _IMPORTANT.sub("", value)
+        declarations.append((name.strip().lower(), _minify_value(value), important))
+
+    return declarations
+
+
+def visible_text(document):
+    # Text a reader sees, with whitespace collapsed; used to check equivalence
+    text = re.sub(r"<style.*?</style>|<!--.*?-->|<[^>]*>", " ", document, flags=re.S)
+    return _WHITESPACE.sub(" ", html.unescape(text)).strip()
+
+
+def _load_artifacts():
+    global _artifacts
+    if _artifacts is None:
+        try:
+            with open(ARTIFACTS_PATH, encoding="utf-8") as artifacts:
+                _artifacts = json.load(artifacts)
+        except (OSError, ValueError):
+            _artifacts = {}
+
+    return _artifacts
+
+
+def _tokenize(document):
+    # Tags, text and comments; the content of raw text elements is one token
+    position = 0
+    while position < len(document):
+        match = _TOKEN.match(document, position)
+        token = match.group(0)
+        position = match.end()
+        yield token
+
+        tag = _TAG.match(token)
+        if tag and not tag.group(1) and tag.group(2).lower() in RAW_TEXT_TAGS:
+            end = document.lower().find(f"</{tag.group(2).lower()}", position)
+            end = len(document) if end == -1 else end
+            yield ("raw", tag.group(2).lower(), document[position:end])
+            position = end
+
+
+def _parse_token(token):
+    if isinstance(token, tuple):
+        return {"kind": "raw", "tag": token[1], "text": token[2]}
+    if token.startswith("<!--"):
+        return {"kind": "comment", "text": token}
+    if token.startswith("<!"):
+        return {"kind": "tag", "name": "!doctype", "closing": False, "text": token}
+
+    tag = _TAG.match(token)
+    if tag is None:
+        return {"kind": "text", "text": token}
+
+    attributes = [
+        (name, value) for name, value in _ATTRIBUTE.findall(tag.group(3)) if name
+    ]
+    return {
+        "kind": "tag",
+        "name": tag.group(2).lower(),
+        "closing": bool(tag.group(1)),
+        "attributes": attributes,
+        "text": token,
+    }
+
+
+def _serialize_tokens(tokens):
+    # Comments go first so the text on either side of them is merged
+    kept = []
+    for token in tokens:
+        if token["kind"] == "comment" and not token["text"].startswith("<!--[if"):
+            continue
+        if token["kind"] == "text" and kept and kept[-1]["kind"] == "text":
+            kept[-1] = {"kind": "text", "text": kept[-1]["text"] + token["text"]}
+            continue
+        kept.append(token)
+
+    parts = []
+    for position, token in enumerate(kept):
+        if token["kind"] == "raw":
+            parts.append(_minify_raw(token))
+        elif token["kind"] == "text":
+            parts.append(_collapse_text(kept, position))
+        elif token["kind"] == "tag" and "attributes" in token:
+            parts.append(_serialize_tag(token))
+        else:
+            parts.append(token["text"])
+
+    return "".join(parts)
+
+
+def _minify_raw(token):
+    if token["tag"] == "style":
+        return token["text"]
+    if token["tag"] == "title":
+        return _WHITESPACE.sub(" ", token["text"]).strip()
+    return token["text"]
+
+
+def _collapse_text(tokens, position):
+    # Whitespace runs render as one space, and not at all next to a block tag
+    text = _WHITESPACE.sub(" ", tokens[position]["text"])
+    if position > 0 and _is_block(tokens[position - 1]):
+        text = text.lstrip(" ")
+    if position + 1 < len(tokens) and _is_block(tokens[position + 1]):
+        text = text.rstrip(" ")
+    return text
+
+
+def _is_block(token):
+    return token["kind"] == "raw" or (
+        token["kind"] == "tag" and token["name"] in BLOCK_TAGS
+    )
+
+
+def _serialize_tag(token):
+    if token["closing"]:
+        return f"</{token['name']}>"
+
+    parts = [f"<{token['name']}"]
+    for name, value in token["attributes"]:
+        if not value:
+            parts.append(f" {name}")
+            continue
+        if name.lower() == "style":
+            declarations = parse_declarations(html.unescape(_unquote(value)))
+            value = '"' + _escape_attribute(_serialize_declarations(declarations)) + '"'
+        parts.append(f" {name}={value}")
+    parts.append(">")
+
+    return "".join(parts)
+
+
+def _inline_styles(tokens, rules):
+    # rules are (compounds, specificity, order, declarations); each element gets
+    # the winning declaration per property, ordered by cascade priority so
+    # shorthands and longhands override each other as they did in the sheet
+    stack = []
+    in_head = False
+    for token in tokens:
+        if token["kind"] != "tag" or "attributes" not in token:
+            continue
+        name = token["name"]
+        if token["closing"]:
+            if name == "head":
+                in_head = False
+            while stack:
+                if stack.pop()["name"] == name:
+                    break
+            continue
+
+        attributes = dict(
+            (key.lower(), _unquote(value)) for key, value in token["attributes"]
+        )
+        element = {
+            "name": name,
+            "classes": set(attributes.get("class", "").split()),
+            "id": attributes.get("id"),
+        }
+        if name == "head":
+            in_head = True
+
+        if not in_head and name not in HEAD_TAGS:
+            _apply_rules(token, element, stack, rules)
+
+        if name not in VOID_TAGS:
+            stack.append(element)
+
+
+def _apply_rules(token, element, ancestors, rules):
+    winners = {}
+    for compounds, specificity, order, declarations in rules:
+        if not _matches(compounds, element, ancestors):
+            continue
+        for name, value, important in declarations:
+            priority = (important, False, specificity, order)
+            if name not in winners or priority >= winners[name][0]:
+                winners[name] = (priority, value, important)
+
+    if not winners:
+        return
+
+    # Inline declarations beat any selector unless the sheet used !important
+    style = next(
+        (value for key, value in token["attributes"] if key.lower() == "style"), None
+    )
+    for order, (name, value, important) in enumerate(
+        parse_declarations(html.unescape(_unquote(style))) if style else []
+    ):
+        priority = (important, True, (0, 0, 0), order)
+        if name not in winners or priority >= winners[name][0]:
+            winners[name] = (priority, value, important)
+
+    declarations = [
+        (name, value, important)
+        for name, (_, value, important) in sorted(
+            winners.items(), key=lambda item: item[1][0]
+        )
+    ]
+    value = '"' + _escape_attribute(_serialize_declarations(declarations)) + '"'
+    token["attributes"] = [
+        (key, v) for key, v in token["attributes"] if key.lower() != "style"
+    ] + [("style", value)]
+
+
+def _matches(compounds, element, ancestors):
+    # Descendant selectors only: match the last compound, then the rest in
+    # order against the nearest possible ancestors
+    if not _matches_compound(compounds[-1], element):
+        return False
+
+    remaining = len(compounds) - 2
+    for ancestor in reversed(ancestors):
+        if remaining < 0:
+            break
+        if _matches_compound(compounds[remaining], ancestor):
+            remaining -= 1
+
+    return remaining < 0
+
+
+def _matches_compound(compound, element):
+    tag, classes, element_id = compound
+    return (
+        (tag is None or tag == element["name"])
+        and classes <= element["classes"]
+        and (element_id is None or element_id == element["id"])
+    )
+
+
+def _split_rules(items):
+    # Returns (items kept in <style>, inlinable rules). Kept rules that could
+    # clash with inlined styles (pseudo-classes, media queries) are made
+    # !important, since inline styles would otherwise override them.
+    retained = []
+    inlined = []
+    order = 0
+    for kind, prelude, body in items:
+        if kind == "block":
+            retained.append((kind, prelude, _important(body)))
+            continue
+        if kind == "statement" or prelude.startswith("@"):
+            retained.append((kind, prelude, body))
+            continue
+
+        kept = []
+        for selector in _split_outside(prelude, ","):
+            compounds = _parse_selector(selector)
+            # "*" alone has the lowest specificity, so it cascades the same
+            # from the <style> block and is not copied onto every element
+            if compounds is None or selector.strip() == "*":
+                kept.append(selector.strip())
+                continue
+            specificity = (
+                sum(1 for _, _, i in compounds if i),
+                sum(len(c) for _, c, _ in compounds),
+                sum(1 for t, _, _ in compounds if t),
+            )
+            inlined.append((compounds, specificity, order, body))
+            order += 1
+
+        if kept:
+            selectors = ",".join(kept)
+            clashing = any(":" in s and "::" not in s for s in kept)
+            retained.append(
+                (kind, selectors, _important_declarations(body) if clashing else body)
+            )
+
+    return retained, inlined
+
+
+def _important(items):
+    important = []
+    for kind, prelude, body in items:
+        if kind == "block":
+            body = _important(body)
+        elif kind == "rule":
+            body = _important_declarations(body)
+        important.append((kind, prelude, body))
+
+    return important
+
+
+def _important_declarations(declarations):
+    return [(name, value, True) for name, value, _ in declarations]
+
+
+def _parse_selector(selector):
+    # [(tag, classes, id)] for descendant selectors of tags, classes and ids;
+    # None for anything else (pseudo-classes, attributes, other combinators)
+    compounds = []
+    for part in selector.split():
+        match = _COMPOUND.match(part)
+        if match is None or not part:
+            return None
+        tag = match.group(1)
+        tag = None if tag in (None, "*") else tag.lower()
+        qualifiers = re.findall(r"([.#])([\w-]+)", match.group(2))
+        ids = [value for kind, value in qualifiers if kind == "#"]
+        if len(ids) > 1:
+            return None
+        compounds.append(
+            (
+                tag,
+                frozenset(value for kind, value in qualifiers if kind == "."),
+                ids[0] if ids else None,
+            )
+        )
+
+    return compounds or None
+
+
+def _parse_items(css, position):
+    items = []
+    while True:
+        end = _find_outside(css, "{;}", position)
+        prelude = css[position:end].strip()
+        if end >= len(css) or css[end] == "}":
+            return items, end + 1
+
+        if css[end] == ";":
+            if prelude:
+                items.append(("statement", prelude, None))
+            position = end + 1
+        elif re.match(r"@(media|supports|document)\b", prelude, re.I):
+            children, position = _parse_items(css, end + 1)
+            items.append(("block", prelude, children))
+        else:
+            close = _find_outside(css, "}", end + 1)
+            items.append(("rule", prelude, parse_declarations(css[end + 1 : close])))
+            position = close + 1
+
+
+def _find_outside(text, characters, start=0):
+    # First position of any of characters outside strings and parentheses
+    quote = None
+    depth = 0
+    position = start
+    while position < len(text):
+        character = text[position]
+        if quote:
+            if character == "\\":
+                position += 1
+            elif character == quote:
+                quote = None
+        elif character in "\"'":
+            quote = character
+        elif character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif depth == 0 and character in characters:
+            return position
+        position += 1
+
+    return len(text)
+
+
+def _split_outside(text, separator):
+    parts = []
+    position = 0
+    while position <= len(text):
+        end = _find_outside(text, separator, position)
+        part = text[position:end].strip()
+        if part:
+            parts.append(part)
+        position = end + 1
+
+    return parts
+
+
+def _strip_comments(css):
+    parts = _STRING.split(css)
+    return "".join(
+        part if index % 2 else re.sub(r"/\*.*?\*/", "", part, flags=re.S)
+        for index, part in enumerate(parts)
+    )
+
+
+def _minify_value(value):
+    parts = _STRING.split(value.strip())
+    for index in range(0, len(parts), 2):
+        part = _WHITESPACE.sub(" ", parts[index])
+        parts[index] = re.sub(r"\s*([,(])\s*|\s*(\))", r"\1\2", part)
+    return "".join(parts).strip()
+
+
+def _minify_selectors(prelude):
+    return ",".join(
+        re.sub(r"\s*([>+~])\s*", r"\1", _WHITESPACE.sub(" ", selector))
+        for selector in _split_outside(prelude, ",")
+    )
+
+
+def _minify_prelude(prelude):
+    # "@media screen and (max-width: 480px)" -> "@media screen and (max-width:480px)"
+    parts = _STRING.split(_WHITESPACE.sub(" ", prelude.strip()))
+    for index in range(0, len(parts), 2):
+        parts[index] = re.sub(r"\(\s*([\w-]+)\s*:\s*", r"(\1:", parts[index])
+        parts[index] = re.sub(r"\s*\)", ")", parts[index])
+    return "".join(parts)
+
+
+def _serialize_declarations(declarations):
+    return ";".join(
+        f"{name}:{value}{'!important' if important else ''}"
+        for name, value, important in declarations
+    )
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _escape_attribute(value):
+    return value.replace("&", "&amp;").replace('"', "&quot;")
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Where request responses and per-recipient sends are remembered
+IDEMPOTENCY_STORE_URL = os.getenv("IDEMPOTENCY_STORE", "memory://")
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 60 * 60)))
+
+_stores = {}
+_lock = threading.Lock()
+
+
+class MemoryIdempotencyStore:
+    # Per-container store; enough for retries that land on the same warm Lambda
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            return entry[0]
+
+    def add(self, key, value, ttl):
+        # Stores value only if key is absent; returns whether it was stored
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                return False
+            self.entries[key] = (value, time.time() + ttl)
+            return True
+
+    def put(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SQLiteIdempotencyStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        # Imported here so the default memory store never loads it
+        import sqlite3
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM idempotency WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def add(self, key, value, ttl):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM idempotency WHERE key = ? AND expires_at <= ?", (key, now)
+            )
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO idempotency VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl),
+            )
+
+        return cursor.rowcount == 1
+
+    def put(self, key, value, ttl):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+
+    def delete(self, key):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+
+# Backends by URL scheme; register_idempotency_store adds shared stores
+IDEMPOTENCY_STORE_BACKENDS = {
+    "memory": lambda location: MemoryIdempotencyStore(),
+    "sqlite": lambda location: SQLiteIdempotencyStore(location),
+}
+
+
+def register_idempotency_store(scheme, factory):
+    IDEMPOTENCY_STORE_BACKENDS[scheme] = factory
+
+
+def get_idempotency_store(url=None):
+    url = url or IDEMPOTENCY_STORE_URL
+    scheme, _, location = url.partition("://")
+    if scheme not in IDEMPOTENCY_STORE_BACKENDS:
+        raise ValueError(f"Unsupported idempotency store: {url}")
+
+    # sqlite:////tmp/keys.db is absolute, sqlite:///keys.db is relative
+    if scheme == "sqlite" and location.startswith("/"):
+        location = location[1:]
+
+    with _lock:
+        store = _stores.get(url)
+        if store is None:
+            store = _stores[url] = IDEMPOTENCY_STORE_BACKENDS[scheme](location)
+
+    return store
+
+
+def request_key(key):
+    return f"request:{key}"
+
+
+def recipient_key(email, scholarship_name, deadline):
+    # One email per (address, scholarship, deadline), whichever request sent it
+    digest = hashlib.sha256(
+        "\0".join((email, str(scholarship_name), str(deadline))).encode("utf-8")
+    ).hexdigest()
+    return f"recipient:{digest}"
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+import uuid
+from results import SendResult
+
+# Where async campaign jobs are checkpointed; "sqlite:///<path>" by default
+JOB_STORE_URL = os.getenv("JOB_STORE", "sqlite:////tmp/scholarship-jobs.db")
+
+_stores = {}
+_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    next_index INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_rows (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class SQLiteJobStore:
+    # Local backend: one SQLite file holding jobs, their rows and the results
+    # written at each checkpoint
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        # Imported here so only containers that process jobs pay for it
+        import sqlite3
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+
+    def create_job(self, rows, options):
+        # rows may be any iterable, e.g. a streamed body, and is read once. If
+        # it raises, nothing is stored.
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        total = 0
+
+        def numbered():
+            nonlocal total
+            for total, row in enumerate(rows, 1):
+                yield job_id, total - 1, json.dumps(row)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs VALUES (?, 'queued', ?, 0, 0, ?, ?)",
+                (job_id, json.dumps(options), now, now),
+            )
+            self.connection.executemany(
+                "INSERT INTO job_rows VALUES (?, ?, ?)", numbered()
+            )
+            self.connection.execute(
+                "UPDATE jobs SET total = ? WHERE id = ?", (total, job_id)
+            )
+
+        return job_id
+
+    def get_job(self, job_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, status, options, total, next_index FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "id": row[0],
+            "status": row[1],
+            "options": json.loads(row[2]),
+            "total": row[3],
+            "next_index": row[4],
+        }
+
+    def load_rows(self, job_id, start, limit):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT idx, row FROM job_rows WHERE job_id = ? AND idx >= ? "
+                "ORDER BY idx LIMIT ?",
+                (job_id, start, limit),
+            ).fetchall()
+
+        return [(idx, json.loads(row)) for idx, row in rows]
+
+    def save_checkpoint(self, job_id, results, next_index, status="running"):
+        # Results and the new resume point are committed together, so a
+        # crashed worker never re-sends a chunk it already recorded
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO job_results VALUES (?, ?, ?)",
+                ((job_id, r.index, json.dumps(r.to_dict())) for r in results),
+            )
+            self.connection.execute(
+                "UPDATE jobs SET next_index = ?, status = ?, updated_at = ? "
+                "WHERE id = ?",
+                (next_index, status, time.time(), job_id),
+            )
+
+    def set_status(self, job_id, status):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (status, time.time(), job_id),
+            )
+
+    def load_result_indexes(self, job_id, start):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT idx FROM job_results WHERE job_id = ? AND idx >= ?",
+                (job_id, start),
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def load_results(self, job_id):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT result FROM job_results WHERE job_id = ? ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+
+        return [SendResult.from_dict(json.loads(row[0])) for row in rows]
+
+
+# Backends by URL scheme; register_job_store adds shared stores for production
+JOB_STORE_BACKENDS = {
+    "sqlite": lambda location: SQLiteJobStore(location),
+}
+
+
+def register_job_store(scheme, factory):
+    JOB_STORE_BACKENDS[scheme] = factory
+
+
+def get_job_store(url=None):
+    url = url or JOB_STORE_URL
+    scheme, _, location = url.partition("://")
+    if scheme not in JOB_STORE_BACKENDS:
+        raise ValueError(f"Unsupported job store: {url}")
+
+    # sqlite:////tmp/jobs.db is absolute, sqlite:///jobs.db is relative
+    if scheme == "sqlite" and location.startswith("/"):
+        location = location[1:]
+
+    with _lock:
+        store = _stores.get(url)
+        if store is None:
+            store = _stores[url] = JOB_STORE_BACKENDS[scheme](location)
+
+    return store
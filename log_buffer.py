@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+# Lines below LOG_LEVEL are dropped before they are formatted. Per-recipient
+# detail is logged at DEBUG, so the default keeps only the summary and problems.
+# The per-invocation summary line is written at every level.
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Buffered lines are written early once this many are waiting
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "1000"))
+
+_threshold = LEVELS.get(LOG_LEVEL, LEVELS["INFO"])
+_lines = []
+_lock = threading.Lock()
+
+
+class SendTally:
+    # Sends and failure reasons behind one invocation's summary line
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = Counter()
+        self.lock = threading.Lock()
+
+
+# Per invocation, so concurrent requests in the self-hosted server each get
+# their own summary; scripts share the default tally
+_tally = ContextVar("log_tally", default=SendTally())
+
+
+def is_enabled(level):
+    return LEVELS[level] >= _threshold
+
+
+def log(level, message, *args):
+    # message is %-formatted with args only when the level is enabled
+    if is_enabled(level):
+        _append(f"[{level}] {message % args if args else message}")
+
+
+def _append(line):
+    with _lock:
+        _lines.append(line)
+        full = len(_lines) >= LOG_BUFFER_LINES
+
+    if full:
+        flush()
+
+
+def debug(message, *args):
+    log("DEBUG", message, *args)
+
+
+def info(message, *args):
+    log("INFO", message, *args)
+
+
+def warning(message, *args):
+    log("WARNING", message, *args)
+
+
+def error(message, *args):
+    log("ERROR", message, *args)
+
+
+def start_invocation():
+    _tally.set(SendTally())
+
+
+def record_sent(count=1):
+    tally = _tally.get()
+    with tally.lock:
+        tally.sent += count
+
+
+def record_failed(reason, count=1):
+    tally = _tally.get()
+    with tally.lock:
+        tally.failed[reason] += count
+
+
+def summary():
+    tally = _tally.get()
+    with tally.lock:
+        sent, failed = tally.sent, dict(tally.failed)
+
+    line = f"Sent {sent} of {sent + sum(failed.values())} emails"
+    if failed:
+        reasons = ", ".join(
+            f"{reason} x{count}"
+            for reason, count in sorted(failed.items(), key=lambda item: -item[1])
+        )
+        line += f", {sum(failed.values())} failed ({reasons})"
+    return line
+
+
+def flush(with_summary=False):
+    # One stdout write for everything buffered. with_summary ends the
+    # invocation: the aggregated summary line is added, whatever LOG_LEVEL is,
+    # and the counts reset.
+    if with_summary:
+        _append(f"[INFO] {summary()}")
+        _tally.set(SendTally())
+
+    with _lock:
+        lines = _lines[:]
+        _lines.clear()
+
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
@@ -1,54 +1,311 @@
-import boto3
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 from dotenv import load_dotenv
 from datetime import datetime
 from botocore.exceptions import ClientError
-from templates import verify_email_template, template_plain_text
 
+# Shared modules live at the repository root (bundled flat into the Lambda zip)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Loaded before the shared modules, which read their settings at import
 load_dotenv()
 
-# SES client setup
-ses_client = boto3.client(
-    "ses",
-    region_name="ap-southeast-1",
-    aws_access_key_id=os.getenv("ACCESS_KEY"),
-    aws_secret_access_key=os.getenv("SECRET_KEY"),
+from templates import (  # noqa: E402
+    bind_verify_template,
+    verify_email_template,
+    template_plain_text,
+)
+from tokens import issue_tokens  # noqa: E402
+from rate_limiter import record_sent, wait_for_token  # noqa: E402
+from retry import call_with_retry  # noqa: E402
+from ses import MAX_POOL_CONNECTIONS  # noqa: E402
+from regions import get_region_pool, send_with_failover  # noqa: E402
+from recipients import normalize_recipients  # noqa: E402
+from suppression import get_suppression_index  # noqa: E402
+from results import (  # noqa: E402
+    DEFAULT_RESPONSE_MODE,
+    RESPONSE_MODES,
+    ResultCollector,
+    SendResult,
 )
+import log_buffer  # noqa: E402
+import metrics  # noqa: E402
+
+SENDER = "no-reply@eduvision.live"
+SUBJECT = "Verify Your Email Address - EduVision"
+
+# Signed tokens are appended to this link as ?token=...
+VERIFY_BASE_URL = os.getenv("VERIFY_BASE_URL", "https://eduvision.live/verify")
+
+# Signup spikes are mostly waiting on SES, so batches send in parallel by default
+DEFAULT_SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "8"))
+MAX_SEND_CONCURRENCY = MAX_POOL_CONNECTIONS
+
+# No new sends or retries start this many seconds before the Lambda timeout
+RESPONSE_RESERVE_SECONDS = float(os.getenv("RESPONSE_RESERVE_SECONDS", "2"))
+
+# Shared SES clients, one per region in SES_REGIONS
+get_region_pool()
+
+
+def lambda_handler(event, context):
+    # Batch entry point: {"users": [{"name": ..., "email": ...}, ...]}
+    metrics.start_invocation(RequestId=getattr(context, "aws_request_id", "local"))
+    log_buffer.start_invocation()
+    try:
+        return handle_event(event, context)
+    finally:
+        log_buffer.flush(with_summary=True)
+        metrics.emit()
+
+
+def handle_event(event, context):
+    try:
+        body = event.get("body", event)
+        if isinstance(body, str):
+            with metrics.timer("parse"):
+                body = json.loads(body)
+
+        users = body.get("users")
+        if not isinstance(users, list) or len(users) == 0:
+            return json_response(
+                400,
+                {
+                    "success": False,
+                    "error": "Bad Request",
+                    "message": "users must be a non-empty array of objects",
+                },
+            )
+
+        mode = body.get("mode", DEFAULT_RESPONSE_MODE)
+        if mode not in RESPONSE_MODES:
+            return json_response(
+                400,
+                {
+                    "success": False,
+                    "error": "Bad Request",
+                    "message": f"mode must be one of {', '.join(RESPONSE_MODES)}",
+                },
+            )
+
+        # Validate, normalize and de-duplicate every user before any SES call
+        with metrics.timer("validate"):
+            recipients, rejected = normalize_recipients(
+                enumerate(users),
+                defaults={},
+                key_fields=(),
+                suppressed=get_suppression_index(),
+            )
+
+        sent = send_verification_batch(
+            recipients, resolve_concurrency(body), time_budget(context)
+        )
+
+        metrics.count_results(rejected + sent)
+        results = ResultCollector(mode)
+        results.extend(sorted(rejected + sent, key=lambda result: result.index))
+        return summary_response(results)
+
+    except json.JSONDecodeError:
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Invalid JSON",
+                "message": "Request body must be valid JSON",
+            },
+        )
+
+    except Exception as e:
+        return json_response(
+            500,
+            {"success": False, "error": "Internal server error", "message": str(e)},
+        )
+
+
+def send_verification_batch(recipients, concurrency=1, stop_at=None):
+    # One email per recipient with its own signed link. Results are returned in
+    # the same order as recipients.
+    if not recipients:
+        return []
+
+    html_template = bind_verify_template(datetime.now().year)
+    tokens = issue_tokens(recipient["email"] for recipient in recipients)
+
+    def send_one(recipient, token):
+        # Sends are not started once the time budget is spent
+        if stop_at is not None and time.monotonic() >= stop_at:
+            return SendResult.for_recipient(recipient, "pending")
+
+        verify_link = f"{VERIFY_BASE_URL}?token={quote(token)}"
+        with metrics.timer("render"):
+            html_body = html_template.render(recipient["name"], verify_link)
+            text_body = template_plain_text(recipient["name"], verify_link)
+
+        response, attempts = _send_with_retry(
+            [recipient["email"]], html_body, text_body, stop_at
+        )
+        if response:
+            return SendResult.for_recipient(
+                recipient,
+                "success",
+                message_id=response["MessageId"],
+                attempts=attempts,
+            )
+
+        return SendResult.for_recipient(
+            recipient, "failed", error="Failed to send email", attempts=attempts
+        )
+
+    if concurrency <= 1 or len(recipients) <= 1:
+        return [send_one(*pair) for pair in zip(recipients, tokens)]
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(recipients))) as executor:
+        return list(metrics.context_map(executor, send_one, recipients, tokens))
 
 
 def send_verification_email(recipient_list, name, verify_link):
-    sender = "no-reply@eduvision.live"
-    subject = "Verify Your Email Address - EduVision"
     year = datetime.now().year
 
+    # Drop malformed and repeated addresses before calling SES
+    recipients, rejected = normalize_recipients(
+        enumerate({"name": name, "email": email} for email in recipient_list),
+        defaults={},
+        key_fields=(),
+        suppressed=get_suppression_index(),
+    )
+    for result in rejected:
+        log_buffer.debug(
+            "⚠️ Skipping %s: %s", result.email or "recipient", result.error
+        )
+    if not recipients:
+        return None
+
     # HTML email body
     html_body = verify_email_template(name, verify_link, year)
 
     # Plain-text version
     text_body = template_plain_text(name, verify_link)
 
-    try:
-        response = ses_client.send_email(
-            Source=sender,
-            Destination={"ToAddresses": recipient_list},
-            Message={
-                "Subject": {"Data": subject, "Charset": "UTF-8"},
-                "Body": {
-                    "Text": {"Data": text_body, "Charset": "UTF-8"},
-                    "Html": {"Data": html_body, "Charset": "UTF-8"},
-                },
-            },
-        )
+    response, _ = _send_with_retry(
+        [r["email"] for r in recipients], html_body, text_body
+    )
+    return response
 
-        print("✅ Verification email sent successfully!")
-        print(f"Message ID: {response['MessageId']}")
+
+def _send_with_retry(to_addresses, html_body, text_body, stop_at=None):
+    # Returns (response, attempts); response is None when the send failed. A
+    # region that still throttles or errors after its retries hands the send
+    # to the next region in SES_REGIONS.
+    def send(ses_client):
+        with metrics.timer("rate_limit"):
+            wait_for_token(ses_client)
+        with metrics.ses_call():
+            response = ses_client.send_email(
+                Source=SENDER,
+                Destination={"ToAddresses": to_addresses},
+                Message={
+                    "Subject": {"Data": SUBJECT, "Charset": "UTF-8"},
+                    "Body": {
+                        "Text": {"Data": text_body, "Charset": "UTF-8"},
+                        "Html": {"Data": html_body, "Charset": "UTF-8"},
+                    },
+                },
+            )
+        record_sent(ses_client, len(to_addresses))
         return response
 
+    try:
+        response, attempts = send_with_failover(
+            get_region_pool(),
+            ", ".join(to_addresses),
+            lambda ses_client, fail_over: call_with_retry(
+                lambda: send(ses_client), stop_at
+            ),
+            stop_at,
+        )
+        log_buffer.record_sent(len(to_addresses))
+        log_buffer.debug(
+            "✅ Verification email sent to %s, Message ID: %s (attempts: %d)",
+            ", ".join(to_addresses),
+            response["MessageId"],
+            attempts,
+        )
+        return response, attempts
+
     except ClientError as e:
-        print(f"❌ Error sending email: {e.response['Error']['Code']}")
-        print(f"Error message: {e.response['Error']['Message']}")
+        log_buffer.record_failed(e.response["Error"]["Code"], len(to_addresses))
+        log_buffer.debug(
+            "❌ Error sending verification email to %s: %s: %s (attempts: %d)",
+            ", ".join(to_addresses),
+            e.response["Error"]["Code"],
+            e.response["Error"]["Message"],
+            e.attempts,
+        )
+        return None, e.attempts
+
+    except Exception as e:
+        # Connection errors that outlasted the retries in every region
+        log_buffer.record_failed(type(e).__name__, len(to_addresses))
+        log_buffer.debug(
+            "❌ Error sending verification email to %s: %s",
+            ", ".join(to_addresses),
+            e,
+        )
+        return None, getattr(e, "attempts", 1)
+
+
+def summary_response(results):
+    counts = results.counts
+    success = counts["success"] > 0 or counts["failed"] == 0
+
+    return json_response(
+        200 if success else 500,
+        {
+            "success": success,
+            "message": f"Processed {results.total - counts['pending']} users",
+            **results.payload(),
+        },
+    )
+
+
+def json_response(status_code, payload):
+    with metrics.timer("serialize"):
+        body = json.dumps(payload)
+
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+        },
+        "body": body,
+    }
+
+
+def resolve_concurrency(body):
+    # Event field takes precedence over the SEND_CONCURRENCY env var
+    concurrency = body.get("concurrency", DEFAULT_SEND_CONCURRENCY)
+    try:
+        concurrency = int(concurrency)
+    except (TypeError, ValueError):
+        concurrency = DEFAULT_SEND_CONCURRENCY
+
+    return max(1, min(concurrency, MAX_SEND_CONCURRENCY))
+
+
+def time_budget(context):
+    # time.monotonic() value at which retries stop, leaving room to respond
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
         return None
 
+    remaining = context.get_remaining_time_in_millis() / 1000
+    return time.monotonic() + max(0, remaining - RESPONSE_RESERVE_SECONDS)
+
 
 if __name__ == "__main__":
     recipient_emails = ["khievkeanghok@gmail.com"]
@@ -56,3 +313,4 @@ if __name__ == "__main__":
     verify_link = "https://eduvision.live/verify?token=abc123"
 
     send_verification_email(recipient_emails, name, verify_link)
+    log_buffer.flush(with_summary=True)
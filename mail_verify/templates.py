@@ -1,5 +1,8 @@
-def verify_email_template(name, verify_link, year):
-    html_body = f"""
+from functools import lru_cache
+from compiled_template import CompiledTemplate
+from html_optimizer import optimize_template
+
+VERIFY_HTML_SOURCE = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -137,11 +140,25 @@ def verify_email_template(name, verify_link, year):
     </body>
     </html>
     """
-    return html_body
 
+# Minified with the CSS inlined; see html_optimizer.py
+_verify_html = optimize_template(
+    "verify_email_template",
+    CompiledTemplate(VERIFY_HTML_SOURCE, ("name", "verify_link", "year")),
+)
 
-def template_plain_text(name, verify_link):
-    html_body = f"""
+
+def verify_email_template(name, verify_link, year):
+    return _verify_html.render(name, verify_link, year)
+
+
+@lru_cache(maxsize=4)
+def bind_verify_template(year):
+    # Year baked into the static markup; batches only render name and link
+    return _verify_html.partial(year=year)
+
+
+VERIFY_TEXT_SOURCE = """
     Verify Your Email Address - EduVision
 
     Dear {name},
@@ -156,4 +173,8 @@ def template_plain_text(name, verify_link):
     The EduVision Team
     """
 
-    return html_body
+_verify_text = CompiledTemplate(VERIFY_TEXT_SOURCE, ("name", "verify_link"))
+
+
+def template_plain_text(name, verify_link):
+    return _verify_text.render(name, verify_link)
@@ -0,0 +1,64 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+# Verify tokens are HMAC-signed, so checking one needs the secret but no store
+VERIFY_TOKEN_SECRET = os.getenv("VERIFY_TOKEN_SECRET", "")
+VERIFY_TOKEN_TTL_SECONDS = int(os.getenv("VERIFY_TOKEN_TTL", str(24 * 60 * 60)))
+
+
+def issue_tokens(emails, ttl=VERIFY_TOKEN_TTL_SECONDS, now=None, secret=None):
+    # One token per email, all expiring together. The keyed HMAC state is
+    # built once and copied per token instead of re-deriving the key pads.
+    expires = int((time.time() if now is None else now) + ttl)
+    signer = hmac.new(_key(secret), digestmod=hashlib.sha256)
+
+    tokens = []
+    for email in emails:
+        payload = f"{_b64encode(email.encode('utf-8'))}.{expires}"
+        mac = signer.copy()
+        mac.update(payload.encode("ascii"))
+        tokens.append(f"{payload}.{_b64encode(mac.digest())}")
+
+    return tokens
+
+
+def verify_token(token, now=None, secret=None):
+    # Returns the email the token was issued for; ValueError if it is
+    # malformed, tampered with or expired
+    try:
+        encoded_email, expires, signature = token.split(".")
+        expires = int(expires)
+        email = _b64decode(encoded_email).decode("utf-8")
+        signature = _b64decode(signature)
+    except (AttributeError, ValueError):
+        raise ValueError("Malformed verify token")
+
+    expected = hmac.new(
+        _key(secret),
+        f"{encoded_email}.{expires}".encode("ascii"),
+        hashlib.sha256,
+    ).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise ValueError("Invalid verify token signature")
+    if (time.time() if now is None else now) >= expires:
+        raise ValueError("Verify token has expired")
+
+    return email
+
+
+def _key(secret=None):
+    secret = secret or VERIFY_TOKEN_SECRET
+    if not secret:
+        raise RuntimeError("VERIFY_TOKEN_SECRET is not set")
+    return secret.encode("utf-8")
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
@@ -1,220 +1,1249 @@
 import json
-import boto3
+import os
+import time
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from botocore.exceptions import ClientError
-from template import template_plain_text, template
+import log_buffer
+import metrics
+from render_cache import (
+    get_raw_digest_message,
+    get_raw_message,
+    get_scholarship_templates,
+)
+from recipients import deadline_sort_key, format_deadline, normalize_recipients
+from template import digest_plain_text, digest_template
+from rate_limiter import record_sent, wait_for_token
+from bulk import send_bulk_templated
+from ses import MAX_POOL_CONNECTIONS
+from regions import get_region_pool, send_with_failover, should_fail_over
+from stream import chunked, iter_json_array, iter_ndjson
+from suppression import (
+    get_suppression_index,
+    is_ses_notification,
+    record_notifications,
+)
+from recipient_files import FILE_FORMATS, iter_recipient_file, resolve_file_format
+from jobs import get_job_store
+from retry import call_with_retry
+from continuation import PayloadFingerprint, decode_token, encode_token
+from results import DEFAULT_RESPONSE_MODE, RESPONSE_MODES, ResultCollector, SendResult
+from idempotency import (
+    IDEMPOTENCY_TTL_SECONDS,
+    get_idempotency_store,
+    recipient_key,
+    request_key,
+)
+
+# Number of recipients sent in parallel; 1 keeps the original sequential loop
+DEFAULT_SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "1"))
+MAX_SEND_CONCURRENCY = MAX_POOL_CONNECTIONS
+
+# "single" sends one SendEmail per recipient, "raw" one SendRawEmail built from
+# a pre-encoded MIME message, and "bulk" uses SES stored templates
+DEFAULT_DELIVERY_MODE = os.getenv("DELIVERY_MODE", "single")
+DELIVERY_MODES = ("single", "raw", "bulk")
+
+# Addresses with several rows in a batch get one email listing every
+# scholarship, instead of one email per row
+DEFAULT_DIGEST = os.getenv("DIGEST_MODE", "0") == "1"
+
+# Bodies larger than this, or sent as NDJSON, are processed in chunks
+STREAM_THRESHOLD_BYTES = int(os.getenv("STREAM_THRESHOLD_BYTES", str(1024 * 1024)))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "100"))
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+# Async jobs: recipients sent per checkpoint, and the function that processes them
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "100"))
+JOB_WORKER_FUNCTION = os.getenv("JOB_WORKER_FUNCTION")
+
+# Left out of the payload an idempotency key is tied to, since a retry or a
+# resume may change them
+IDEMPOTENCY_IGNORED_FIELDS = ("idempotency_key", "continuation_token")
+
+# Retries stop this many seconds before the Lambda timeout
+RESPONSE_RESERVE_SECONDS = float(os.getenv("RESPONSE_RESERVE_SECONDS", "2"))
+
+SENDER = "no-reply@eduvision.live"
+
+# Created during Lambda INIT and reused across warm invocations. Templates are
+# compiled when template.py is imported, so the first request pays for neither.
+get_region_pool()
+get_idempotency_store()
+get_suppression_index()
 
 
 def lambda_handler(event, context):
-    # Initialize SES client
-    ses_client = boto3.client("ses", region_name="ap-southeast-1")
+    # Keep-warm pings are left out of the metrics
+    if is_warmup(event):
+        return handle_event(event, context)
 
+    # One EMF metrics line per invocation, whatever the outcome
+    metrics.start_invocation(RequestId=getattr(context, "aws_request_id", "local"))
+    log_buffer.start_invocation()
     try:
+        response = handle_event(event, context)
+        metrics.set_property("StatusCode", response["statusCode"])
+        return response
+    finally:
+        log_buffer.flush(with_summary=True)
+        metrics.emit()
+
+
+def handle_event(event, context):
+    try:
+        # Scheduled keep-warm pings never reach the request handling
+        if is_warmup(event):
+            return warmup()
+
+        # SES bounce and complaint notifications from the SNS topic
+        if is_ses_notification(event):
+            return handle_notifications(event)
+
         body = event.get("body", event)  # fallback to entire event if 'body' missing
+
+        # Large and NDJSON bodies are parsed and sent chunk by chunk
+        stop_at = time_budget(context)
+
+        if isinstance(body, str) and is_stream_request(event, body):
+            return with_idempotency(
+                event, body, lambda: handle_stream(event, body, stop_at)
+            )
+
         if isinstance(body, str):
-            body = json.loads(body)
-
-        # Extract data array
-        data = body.get("data", [])
-
-        # Validate data is a list and not empty
-        if not isinstance(data, list) or len(data) == 0:
-            return {
-                "statusCode": 400,
-                "headers": {
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*",
+            with metrics.timer("parse"):
+                body = json.loads(body)
+
+        # Worker invocations and status checks for async jobs
+        if "job_id" in body:
+            return handle_job(body, stop_at)
+
+        # Recipients read from a CSV or NDJSON file instead of the body
+        if "source" in body:
+            return with_idempotency(event, body, lambda: handle_source(body, stop_at))
+
+        return with_idempotency(event, body, lambda: handle_batch(body, stop_at))
+
+    except json.JSONDecodeError:
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Invalid JSON",
+                "message": "Request body must be valid JSON",
+            },
+        )
+
+    except ClientError as e:
+        return json_response(
+            500,
+            {
+                "success": False,
+                "error": f'SES Error: {e.response["Error"]["Code"]}',
+                "message": e.response["Error"]["Message"],
+            },
+        )
+
+    except Exception as e:
+        return json_response(
+            500,
+            {"success": False, "error": "Internal server error", "message": str(e)},
+        )
+
+
+def handle_batch(body, stop_at=None):
+    # Extract data array
+    data = body.get("data", [])
+
+    # Validate data is a list and not empty
+    if not isinstance(data, list) or len(data) == 0:
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Bad Request",
+                "message": "data must be a non-empty array of objects",
+            },
+        )
+
+    delivery = resolve_delivery(body)
+    if delivery is None:
+        return invalid_delivery_response()
+
+    mode = resolve_response_mode(body)
+    if mode is None:
+        return invalid_response_mode_response()
+
+    digest = resolve_digest(body)
+
+    # Oversize campaigns are queued and sent by checkpointed workers
+    if resolve_flag(body, "async"):
+        return enqueue_job(body, data)
+
+    # A continuation token limits this request to rows an earlier one left unsent
+    rows = enumerate(data)
+    token = body.get("continuation_token")
+    if token:
+        try:
+            pending, fingerprint, fingerprint_rows = decode_token(token)
+        except ValueError as e:
+            return json_response(
+                400, {"success": False, "error": "Bad Request", "message": str(e)}
+            )
+        if fingerprint != payload_fingerprint(data[:fingerprint_rows]):
+            return continuation_mismatch_response()
+        rows = ((i, row) for i, row in rows if i in pending)
+
+    # Validate, normalize and de-duplicate every row before any SES call
+    with metrics.timer("validate"):
+        recipients, rejected = normalize_recipients(
+            rows, suppressed=get_suppression_index()
+        )
+
+    # Fail fast instead of sending part of a batch SES would cut off
+    remaining_quota = get_region_pool().remaining_daily_quota()
+    messages = message_count(recipients, digest)
+    if remaining_quota is not None and messages > remaining_quota:
+        return json_response(
+            429,
+            {
+                "success": False,
+                "error": "Daily quota exceeded",
+                "message": f"{messages} emails exceed the remaining SES daily quota of {remaining_quota}",
+                "summary": {
+                    "total": len(recipients) + len(rejected),
+                    "successful": 0,
+                    "failed": 0,
+                    "remainingQuota": remaining_quota,
                 },
-                "body": json.dumps(
-                    {
-                        "success": False,
-                        "error": "Bad Request",
-                        "message": "data must be a non-empty array of objects",
-                    }
-                ),
-            }
+            },
+        )
 
-        # Process each recipient in the data array
-        results = []
-        successful_sends = 0
-        failed_sends = 0
-
-        for i, recipient_data in enumerate(data):
-            try:
-                # Extract individual recipient data with defaults
-                name = recipient_data.get("name", f"Student {i+1}")
-                email = recipient_data.get("email")
-                scholarship_name = recipient_data.get(
-                    "scholarship_name", "Scholarship Program"
-                )
-                deadline = recipient_data.get("deadline", "2025-12-31")
-                apply_link = recipient_data.get("apply_link", "https://eduvision.live")
-
-                # Validate email is provided
-                if not email:
-                    results.append(
-                        {
-                            "index": i,
-                            "name": name,
-                            "status": "failed",
-                            "error": "Email address is required",
-                        }
-                    )
-                    failed_sends += 1
-                    continue
+    # Send to each recipient, optionally fanning out over a worker pool
+    sent = send_recipients(
+        recipients, delivery, resolve_concurrency(body), stop_at, digest
+    )
+
+    # Counted as results are produced rather than per response, so job status
+    # checks and replayed responses never count a send twice
+    metrics.count_results(rejected + sent)
+
+    # Merge back into one result per original index
+    results = ResultCollector(mode)
+    results.extend(sorted(rejected + sent, key=lambda result: result.index))
+
+    # Out of time: hand back a token for the rows that were never attempted
+    if results.pending_indexes:
+        return summary_response(
+            results,
+            continuation_token=encode_token(
+                results.pending_indexes, payload_fingerprint(data)
+            ),
+        )
+
+    return summary_response(results)
+
+
+def handle_stream(event, text, stop_at=None):
+    options = dict(event.get("queryStringParameters") or {})
+    if is_ndjson(event):
+        return process_rows(lambda: iter_ndjson(text), options, stop_at)
+
+    return process_rows(
+        lambda: iter_json_array(text, "data", options), options, stop_at
+    )
+
+
+def handle_source(body, stop_at=None):
+    # body["source"] is an s3:// URI or, with RECIPIENT_FILE_ROOT set, a local
+    # path. Options come from the rest of the body.
+    uri = body["source"]
+    file_format = (
+        resolve_file_format(uri, body.get("format")) if isinstance(uri, str) else None
+    )
+    if file_format is None:
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Bad Request",
+                "message": "source must be a .csv, .ndjson or .jsonl file, "
+                f"or set format to one of {', '.join(FILE_FORMATS)}",
+            },
+        )
+    if body.get("async"):
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Bad Request",
+                "message": "async is not supported with source",
+            },
+        )
+
+    try:
+        rows = iter_recipient_file(uri, file_format)
+    except (ValueError, OSError, ClientError) as e:
+        return json_response(
+            400,
+            {
+                "success": False,
+                "error": "Bad Request",
+                "message": f"Could not read {uri}: {e}",
+            },
+        )
+
+    # The file opened above is read first; a resumed request opens it again to
+    # check its fingerprint
+    opened = [rows]
+
+    def open_rows():
+        return opened.pop() if opened else iter_recipient_file(uri, file_format)
+
+    return process_rows(open_rows, dict(body), stop_at, f"{uri} has no recipients")
 
-                # Send email to individual recipient
-                response = send_scholarship_email(
-                    ses_client, [email], name, scholarship_name, deadline, apply_link
-                )
 
-                if response:
-                    results.append(
-                        {
-                            "index": i,
-                            "name": name,
-                            "email": email,
-                            "status": "success",
-                            "messageId": response["MessageId"],
-                        }
+def process_rows(
+    open_rows,
+    options,
+    stop_at=None,
+    empty_message="data must be a non-empty array of objects",
+):
+    # Memory stays bounded by STREAM_CHUNK_SIZE: each chunk is parsed, validated
+    # and sent before the next one is read. open_rows() returns a new iterator
+    # over the rows each time it is called. options may still be filled in
+    # while the first rows are parsed.
+    results = None
+    seen = {}
+    delivery = concurrency = digest = None
+    pending = None
+    quota_exceeded = False
+    fingerprint = PayloadFingerprint()
+    next_index = 0
+
+    # A row that cannot be parsed ends the stream; the rows before it are
+    # still sent, and the response says where it stopped
+    parse_error = None
+
+    def read_rows():
+        nonlocal parse_error
+        try:
+            # Rows are parsed lazily, so parse time is charged as each is read
+            yield from metrics.timed_iter("parse", open_rows())
+        except ValueError as e:
+            parse_error = e
+
+    chunks = chunked(enumerate(read_rows()), STREAM_CHUNK_SIZE)
+    for chunk in chunks:
+        # Options are read once the fields before the data array are parsed
+        if delivery is None:
+            delivery = resolve_delivery(options)
+            if delivery is None:
+                return invalid_delivery_response()
+            mode = resolve_response_mode(options)
+            if mode is None:
+                return invalid_response_mode_response()
+            results = ResultCollector(mode)
+            concurrency = resolve_concurrency(options)
+            digest = resolve_digest(options)
+
+            # Queued as a job instead, reading the rest of the stream into it
+            if resolve_flag(options, "async"):
+                return enqueue_stream(chunk, chunks, options, lambda: parse_error)
+
+            if options.get("continuation_token"):
+                try:
+                    pending, expected_fingerprint, fingerprint_rows = decode_token(
+                        options["continuation_token"]
+                    )
+                    # Checked with a separate pass over the payload before
+                    # anything is sent, since the rows are only read once below
+                    resumed = payload_fingerprint(
+                        islice(
+                            metrics.timed_iter("parse", open_rows()), fingerprint_rows
+                        )
                     )
-                    successful_sends += 1
-                else:
-                    results.append(
-                        {
-                            "index": i,
-                            "name": name,
-                            "email": email,
-                            "status": "failed",
-                            "error": "Failed to send email",
-                        }
+                except ValueError as e:
+                    return json_response(
+                        400,
+                        {"success": False, "error": "Bad Request", "message": str(e)},
                     )
-                    failed_sends += 1
-
-            except Exception as e:
-                results.append(
-                    {
-                        "index": i,
-                        "name": recipient_data.get("name", f"Student {i+1}"),
-                        "email": recipient_data.get("email", "unknown"),
-                        "status": "failed",
-                        "error": str(e),
-                    }
+                if resumed != expected_fingerprint:
+                    return continuation_mismatch_response()
+
+        for _, row in chunk:
+            fingerprint.update(row)
+        next_index = chunk[-1][0] + 1
+        if pending is not None:
+            chunk = [(i, row) for i, row in chunk if i in pending]
+
+        with metrics.timer("validate"):
+            recipients, rejected = normalize_recipients(
+                chunk, seen=seen, suppressed=get_suppression_index()
+            )
+
+        if not has_quota_for(recipients, digest):
+            quota_exceeded = True
+
+        if out_of_time(stop_at):
+            sent = [pending_result(recipient) for recipient in recipients]
+        elif quota_exceeded:
+            sent = [
+                SendResult.for_recipient(
+                    recipient, "failed", error="Daily quota exceeded"
                 )
-                failed_sends += 1
-
-        # Return summary response
-        return {
-            "statusCode": 200 if successful_sends > 0 else 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps(
-                {
-                    "success": successful_sends > 0,
-                    "message": f"Processed {len(data)} recipients",
-                    "summary": {
-                        "total": len(data),
-                        "successful": successful_sends,
-                        "failed": failed_sends,
-                    },
-                    "results": results,
-                }
+                for recipient in recipients
+            ]
+        else:
+            sent = send_recipients(recipients, delivery, concurrency, stop_at, digest)
+
+        metrics.count_results(rejected + sent)
+        results.extend(sorted(rejected + sent, key=lambda result: result.index))
+        log_buffer.flush()
+
+    if parse_error is not None and delivery is None:
+        return json_response(
+            400,
+            {"success": False, "error": "Invalid JSON", "message": str(parse_error)},
+        )
+
+    if delivery is None:
+        return json_response(
+            400, {"success": False, "error": "Bad Request", "message": empty_message}
+        )
+
+    # Resending the payload with the row fixed and this token sends the rest
+    if parse_error is not None:
+        results.add(
+            SendResult(
+                next_index,
+                f"Student {next_index + 1}",
+                "unknown",
+                "failed",
+                error=f"Could not parse row: {parse_error}",
+            )
+        )
+        return summary_response(
+            results,
+            continuation_token=encode_token(
+                results.pending_indexes, fingerprint.hexdigest(), rows=next_index
             ),
-        }
+            error=f"Stopped at row {next_index}, which could not be parsed",
+        )
 
-    except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps(
-                {
-                    "success": False,
-                    "error": "Invalid JSON",
-                    "message": "Request body must be valid JSON",
-                }
+    if results.pending_indexes:
+        return summary_response(
+            results,
+            continuation_token=encode_token(
+                results.pending_indexes, fingerprint.hexdigest()
             ),
-        }
+        )
 
-    except ClientError as e:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
+    return summary_response(results)
+
+
+def handle_notifications(event):
+    suppressed = record_notifications(event)
+    log_buffer.info("🚫 Suppressed %d addresses", len(suppressed))
+    return json_response(200, {"success": True, "suppressed": len(suppressed)})
+
+
+def enqueue_job(body, data):
+    # data may be an iterator over a streamed body's rows
+    options = {
+        key: value for key, value in body.items() if key not in ("data", "async")
+    }
+    store = get_job_store()
+    job_id = store.create_job(data, options)
+    start_job_worker(job_id)
+
+    return json_response(
+        202,
+        {
+            "success": True,
+            "message": f"Queued {store.get_job(job_id)['total']} recipients",
+            "jobId": job_id,
+            "status": "queued",
+        },
+    )
+
+
+def enqueue_stream(chunk, chunks, options, get_parse_error):
+    # chunk has been read from chunks already. A row that cannot be parsed
+    # rejects the whole job, since nothing has been sent yet.
+    def rows():
+        for rows_chunk in chain([chunk], chunks):
+            for _, row in rows_chunk:
+                yield row
+        if get_parse_error() is not None:
+            raise get_parse_error()
+
+    try:
+        return enqueue_job(options, rows())
+    except ValueError as e:
+        return json_response(
+            400, {"success": False, "error": "Invalid JSON", "message": str(e)}
+        )
+
+
+def start_job_worker(job_id):
+    # Without a worker function, the caller or a schedule sends
+    # {"job_id": ..., "action": "process"} to drive the job
+    if not JOB_WORKER_FUNCTION:
+        return
+
+    import boto3
+
+    boto3.client("lambda").invoke(
+        FunctionName=JOB_WORKER_FUNCTION,
+        InvocationType="Event",
+        Payload=json.dumps({"job_id": job_id, "action": "process"}),
+    )
+
+
+def handle_job(body, stop_at=None):
+    store = get_job_store()
+    job = store.get_job(body["job_id"])
+    if job is None:
+        return json_response(
+            404,
+            {
+                "success": False,
+                "error": "Not Found",
+                "message": f"Unknown job {body['job_id']}",
             },
-            "body": json.dumps(
+        )
+
+    # Status checks may ask for a different mode than the job was queued with
+    mode = resolve_response_mode(body if "mode" in body else job["options"])
+    if mode is None:
+        return invalid_response_mode_response()
+
+    if body.get("action", "status") == "process" and job["status"] != "completed":
+        process_job(store, job, stop_at)
+        job = store.get_job(job["id"])
+
+    return job_status_response(store, job, mode)
+
+
+def process_job(store, job, stop_at=None):
+    # Resumes from the last checkpoint, so retried or crashed workers never
+    # re-send a chunk whose results were already saved
+    job_id = job["id"]
+    delivery = resolve_delivery(job["options"]) or DEFAULT_DELIVERY_MODE
+    concurrency = resolve_concurrency(job["options"])
+    digest = resolve_digest(job["options"])
+
+    # Rebuild the duplicate check from the rows handled before the checkpoint
+    seen = {}
+    start = 0
+    while start < job["next_index"]:
+        rows = store.load_rows(
+            job_id, start, min(JOB_CHUNK_SIZE, job["next_index"] - start)
+        )
+        normalize_recipients(rows, seen=seen)
+        start = rows[-1][0] + 1
+
+    # Rows past the checkpoint that already have results (sent concurrently
+    # before the time budget ran out) are not sent again
+    done = store.load_result_indexes(job_id, start)
+
+    while True:
+        # Hand the rest of the job to a fresh invocation before the timeout
+        if out_of_time(stop_at):
+            start_job_worker(job_id)
+            return
+
+        rows = store.load_rows(job_id, start, JOB_CHUNK_SIZE)
+        if not rows:
+            break
+
+        with metrics.timer("validate"):
+            recipients, rejected = normalize_recipients(
+                rows, seen=seen, suppressed=get_suppression_index()
+            )
+        recipients = [r for r in recipients if r["index"] not in done]
+        rejected = [r for r in rejected if r.index not in done]
+
+        # Pause rather than fail, so the job can resume once quota frees up
+        if not has_quota_for(recipients, digest):
+            store.set_status(job_id, "paused")
+            return
+
+        sent = send_recipients(recipients, delivery, concurrency, stop_at, digest)
+        metrics.count_results(rejected + sent)
+        finished = [r for r in rejected + sent if r.status != "pending"]
+        unsent = [r.index for r in sent if r.status == "pending"]
+
+        # The checkpoint never moves past a row that was not attempted
+        start = min(unsent) if unsent else rows[-1][0] + 1
+        store.save_checkpoint(job_id, finished, start)
+        done.update(r.index for r in finished)
+        log_buffer.flush()
+
+    store.set_status(job_id, "completed")
+
+
+def job_status_response(store, job, mode=DEFAULT_RESPONSE_MODE):
+    progress = {
+        "jobId": job["id"],
+        "status": job["status"],
+        "processed": job["next_index"],
+    }
+    if job["status"] == "completed":
+        results = ResultCollector(mode)
+        results.extend(store.load_results(job["id"]))
+        return summary_response(results, **progress)
+
+    return json_response(
+        202,
+        {
+            "success": True,
+            "message": f"Processed {job['next_index']} of {job['total']} recipients",
+            "total": job["total"],
+            **progress,
+        },
+    )
+
+
+def is_warmup(event):
+    return (
+        bool(event.get("warmup")) or event.get("source") == "serverless-plugin-warmup"
+    )
+
+
+def warmup():
+    # Fetching the quotas opens each region's pooled SES connection and fills
+    # its rate limiter, so the next real request starts sending straight away
+    get_region_pool().remaining_daily_quota()
+    log_buffer.flush()
+    return json_response(200, {"success": True, "warm": True})
+
+
+def out_of_time(stop_at):
+    return stop_at is not None and time.monotonic() >= stop_at
+
+
+def pending_result(recipient):
+    return SendResult.for_recipient(recipient, "pending")
+
+
+def payload_fingerprint(data):
+    fingerprint = PayloadFingerprint()
+    for row in data:
+        fingerprint.update(row)
+    return fingerprint.hexdigest()
+
+
+def continuation_mismatch_response():
+    return json_response(
+        409,
+        {
+            "success": False,
+            "error": "Conflict",
+            "message": "continuation_token was issued for a different payload",
+        },
+    )
+
+
+def has_quota_for(recipients, digest=False):
+    remaining_quota = get_region_pool().remaining_daily_quota()
+    return (
+        remaining_quota is None or message_count(recipients, digest) <= remaining_quota
+    )
+
+
+def message_count(recipients, digest=False):
+    # Emails the recipients take: one per address in digest mode
+    if digest:
+        return len({recipient["email"] for recipient in recipients})
+    return len(recipients)
+
+
+def is_stream_request(event, text):
+    return is_ndjson(event) or len(text) > STREAM_THRESHOLD_BYTES
+
+
+def is_ndjson(event):
+    headers = event.get("headers") or {}
+    content_type = next(
+        (value for key, value in headers.items() if key.lower() == "content-type"),
+        "",
+    )
+    return content_type.split(";")[0].strip() in NDJSON_CONTENT_TYPES
+
+
+def send_recipients(recipients, delivery, concurrency, stop_at=None, digest=False):
+    # Each (email, scholarship, deadline) is claimed in the dedupe store before
+    # sending, so recipients already emailed by an earlier request are skipped
+    # and ones another request is still sending are reported as failed
+    store = get_idempotency_store()
+    pending = []
+    keys = {}
+    claimed = []
+
+    for recipient in recipients:
+        key = recipient_key(
+            recipient["email"], recipient["scholarship_name"], recipient["deadline"]
+        )
+        if store.add(key, {"messageId": None}, IDEMPOTENCY_TTL_SECONDS):
+            keys[recipient["index"]] = key
+            pending.append(recipient)
+            continue
+
+        # A claim with no messageId yet is still being sent by another request
+        previous = store.get(key) or {}
+        if previous.get("messageId") is None:
+            claimed.append(
+                SendResult.for_recipient(
+                    recipient, "failed", error="Send already in progress"
+                )
+            )
+            continue
+
+        claimed.append(
+            SendResult.for_recipient(
+                recipient,
+                "skipped",
+                error="Already sent",
+                message_id=previous["messageId"],
+            )
+        )
+
+    metrics.set_property("Delivery", delivery)
+    sent = []
+    try:
+        if digest:
+            # Addresses with several rows get one digest; the rest are sent
+            # below in the requested delivery mode
+            groups = group_by_email(pending)
+            pending = [group[0] for group in groups if len(group) == 1]
+            sent = send_digests(
+                get_region_pool(),
+                [group for group in groups if len(group) > 1],
+                concurrency,
+                stop_at,
+                delivery == "raw",
+            )
+
+        if delivery == "bulk":
+            sent += send_bulk_templated(
+                get_region_pool(),
+                SENDER,
+                pending,
+                datetime.now().year,
+                concurrency,
+                stop_at,
+            )
+        else:
+            sent += send_all(
+                get_region_pool(), pending, concurrency, stop_at, delivery == "raw"
+            )
+
+    finally:
+        # Every claim without a successful send is released so a retry can
+        # send it again, including when a send raised
+        message_ids = {
+            result.index: result.message_id
+            for result in sent
+            if result.status == "success"
+        }
+        for index, key in keys.items():
+            if index in message_ids:
+                store.put(
+                    key, {"messageId": message_ids[index]}, IDEMPOTENCY_TTL_SECONDS
+                )
+            else:
+                store.delete(key)
+
+    return claimed + sent
+
+
+def with_idempotency(event, body, handle):
+    # Replays the stored response for a repeated idempotency key. Server errors,
+    # quota rejections and partial (206) responses are not stored, so retrying
+    # those, or resuming with the continuation token, does real work.
+    key = get_idempotency_key(event, body if isinstance(body, dict) else {})
+    if not key:
+        return handle()
+
+    store = get_idempotency_store()
+    stored_key = request_key(key)
+    fingerprint = request_fingerprint(event, body)
+    marker = {"inProgress": True, "fingerprint": fingerprint}
+    if not store.add(stored_key, marker, IDEMPOTENCY_TTL_SECONDS):
+        stored = store.get(stored_key) or marker
+        # The key was first used for a different request
+        if stored.get("fingerprint", fingerprint) != fingerprint:
+            return json_response(
+                422,
+                {
+                    "success": False,
+                    "error": "Idempotency key reused",
+                    "message": f"Request {key} was already used with a different payload",
+                },
+            )
+        if stored.get("inProgress"):
+            return json_response(
+                409,
                 {
                     "success": False,
-                    "error": f'SES Error: {e.response["Error"]["Code"]}',
-                    "message": e.response["Error"]["Message"],
-                }
+                    "error": "Conflict",
+                    "message": f"Request {key} is still being processed",
+                },
+            )
+        # Entries stored before fingerprints were kept are the bare response
+        return stored.get("response", stored)
+
+    try:
+        response = handle()
+    except Exception:
+        store.delete(stored_key)
+        raise
+
+    if response["statusCode"] < 500 and response["statusCode"] not in (206, 429):
+        store.put(
+            stored_key,
+            {"fingerprint": fingerprint, "response": response},
+            IDEMPOTENCY_TTL_SECONDS,
+        )
+    else:
+        store.delete(stored_key)
+
+    return response
+
+
+def request_fingerprint(event, body):
+    # Hash of the body and query string, leaving out the fields a retry or a
+    # resume may change. Streamed bodies are hashed as text.
+    fingerprint = PayloadFingerprint()
+    for fields in (event.get("queryStringParameters") or {}, body):
+        if isinstance(fields, dict):
+            fields = {
+                name: value
+                for name, value in fields.items()
+                if name not in IDEMPOTENCY_IGNORED_FIELDS
+            }
+        fingerprint.update(fields)
+    return fingerprint.hexdigest()
+
+
+def get_idempotency_key(event, body):
+    headers = event.get("headers") or {}
+    for name, value in headers.items():
+        if name.lower() == "idempotency-key":
+            return value
+
+    query = event.get("queryStringParameters") or {}
+    return query.get("idempotency_key") or body.get("idempotency_key")
+
+
+def summary_response(results, continuation_token=None, **extra):
+    # results is a ResultCollector; its mode decides how much is returned
+    counts = results.counts
+
+    # A batch where every row was skipped (e.g. a retry) still succeeded
+    success = counts["success"] > 0 or counts["failed"] == 0
+
+    payload = {
+        "success": success,
+        "message": f"Processed {results.total - counts['pending']} recipients",
+        **results.payload(),
+        **extra,
+    }
+
+    # Partial response: resend the same payload with this token to finish
+    if continuation_token:
+        payload["complete"] = False
+        payload["continuationToken"] = continuation_token
+        return json_response(206, payload)
+
+    # Return summary response
+    return json_response(200 if success else 500, payload)
+
+
+def invalid_delivery_response():
+    return json_response(
+        400,
+        {
+            "success": False,
+            "error": "Bad Request",
+            "message": f"delivery must be one of {', '.join(DELIVERY_MODES)}",
+        },
+    )
+
+
+def invalid_response_mode_response():
+    return json_response(
+        400,
+        {
+            "success": False,
+            "error": "Bad Request",
+            "message": f"mode must be one of {', '.join(RESPONSE_MODES)}",
+        },
+    )
+
+
+def json_response(status_code, payload):
+    with metrics.timer("serialize"):
+        body = json.dumps(payload)
+
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+        },
+        "body": body,
+    }
+
+
+def resolve_delivery(body):
+    # Returns None for an unknown mode
+    delivery = body.get("delivery", DEFAULT_DELIVERY_MODE)
+    return delivery if delivery in DELIVERY_MODES else None
+
+
+def resolve_response_mode(body):
+    # Returns None for an unknown mode
+    mode = body.get("mode", DEFAULT_RESPONSE_MODE)
+    return mode if mode in RESPONSE_MODES else None
+
+
+def resolve_digest(body):
+    return resolve_flag(body, "digest", DEFAULT_DIGEST)
+
+
+def resolve_flag(body, name, default=False):
+    # Query string values arrive as strings
+    value = body.get(name, default)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true")
+    return bool(value)
+
+
+def resolve_concurrency(body):
+    # Event field takes precedence over the SEND_CONCURRENCY env var
+    concurrency = body.get("concurrency", DEFAULT_SEND_CONCURRENCY)
+    try:
+        concurrency = int(concurrency)
+    except (TypeError, ValueError):
+        concurrency = DEFAULT_SEND_CONCURRENCY
+
+    return max(1, min(concurrency, MAX_SEND_CONCURRENCY))
+
+
+def time_budget(context):
+    # time.monotonic() value at which retries stop, leaving room to respond
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+
+    remaining = context.get_remaining_time_in_millis() / 1000
+    return time.monotonic() + max(0, remaining - RESPONSE_RESERVE_SECONDS)
+
+
+def send_all(pool, recipients, concurrency=1, stop_at=None, raw=False):
+    # Results are returned in the same order as recipients, regardless of concurrency
+    if concurrency <= 1 or len(recipients) <= 1:
+        return [
+            process_recipient(pool, recipient, stop_at, raw) for recipient in recipients
+        ]
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(recipients))) as executor:
+        return list(
+            metrics.context_map(
+                executor,
+                lambda recipient: process_recipient(pool, recipient, stop_at, raw),
+                recipients,
+            )
+        )
+
+
+def send_digests(pool, groups, concurrency=1, stop_at=None, raw=False):
+    # groups come from group_by_email; one result per row, group by group
+    if concurrency <= 1 or len(groups) <= 1:
+        results = [process_digest(pool, group, stop_at, raw) for group in groups]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(groups))) as executor:
+            results = list(
+                metrics.context_map(
+                    executor,
+                    lambda group: process_digest(pool, group, stop_at, raw),
+                    groups,
+                )
+            )
+
+    return [result for group_results in results for result in group_results]
+
+
+def group_by_email(recipients):
+    # Rows per address in order of first appearance, each group sorted by
+    # deadline so the digest lists the soonest first
+    groups = {}
+    for recipient in recipients:
+        groups.setdefault(recipient["email"], []).append(recipient)
+
+    return [
+        sorted(group, key=lambda recipient: deadline_sort_key(recipient["deadline"]))
+        for group in groups.values()
+    ]
+
+
+def process_recipient(pool, recipient, stop_at=None, raw=False):
+    # Sends are not started once the time budget is spent
+    if out_of_time(stop_at):
+        return pending_result(recipient)
+
+    try:
+        # Send email to individual recipient
+        response, attempts = send_with_failover(
+            pool,
+            recipient["email"],
+            lambda ses_client, fail_over: send_scholarship_email(
+                ses_client,
+                [recipient["email"]],
+                recipient["name"],
+                recipient["scholarship_name"],
+                recipient["deadline"],
+                recipient["apply_link"],
+                stop_at=stop_at,
+                raw=raw,
+                fail_over=fail_over,
             ),
-        }
+            stop_at,
+        )
 
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps(
-                {"success": False, "error": "Internal server error", "message": str(e)}
+        log_buffer.record_failed(type(e).__name__)
+        log_buffer.debug("❌ Error sending email to %s: %s", recipient["email"], e)
+        return SendResult.for_recipient(recipient, "failed", error=str(e))
+
+    if response:
+        return SendResult.for_recipient(
+            recipient,
+            "success",
+            message_id=response["MessageId"],
+            attempts=attempts,
+        )
+
+    return SendResult.for_recipient(
+        recipient, "failed", error="Failed to send email", attempts=attempts
+    )
+
+
+def process_digest(pool, group, stop_at=None, raw=False):
+    # One email for every row in group, which all share an address; each row
+    # gets its own result carrying the digest's outcome
+    if out_of_time(stop_at):
+        return [pending_result(recipient) for recipient in group]
+
+    email = group[0]["email"]
+    scholarships = tuple(
+        (
+            recipient["scholarship_name"],
+            recipient["friendly_deadline"],
+            recipient["apply_link"],
+        )
+        for recipient in group
+    )
+
+    try:
+        response, attempts = send_with_failover(
+            pool,
+            email,
+            lambda ses_client, fail_over: send_digest_email(
+                ses_client,
+                [email],
+                group[0]["name"],
+                scholarships,
+                stop_at=stop_at,
+                raw=raw,
+                fail_over=fail_over,
             ),
-        }
+            stop_at,
+        )
+
+    except Exception as e:
+        log_buffer.record_failed(type(e).__name__)
+        log_buffer.debug("❌ Error sending digest to %s: %s", email, e)
+        return [
+            SendResult.for_recipient(recipient, "failed", error=str(e))
+            for recipient in group
+        ]
+
+    if response:
+        metrics.count("Digests")
+        return [
+            SendResult.for_recipient(
+                recipient,
+                "success",
+                message_id=response["MessageId"],
+                attempts=attempts,
+            )
+            for recipient in group
+        ]
+
+    return [
+        SendResult.for_recipient(
+            recipient, "failed", error="Failed to send email", attempts=attempts
+        )
+        for recipient in group
+    ]
 
 
 def send_scholarship_email(
-    ses_client, recipient_list, name, scholarship_name, deadline, apply_link
+    ses_client,
+    recipient_list,
+    name,
+    scholarship_name,
+    deadline,
+    apply_link,
+    stop_at=None,
+    raw=False,
+    fail_over=False,
 ):
-    sender = "no-reply@eduvision.live"
+    # Returns (response, attempts); response is None when the send failed.
+    # With fail_over, errors another region might not have are raised instead.
     subject = f"🚨 URGENT: {scholarship_name} - Deadline in 3 Days"
+    friendly_deadline = format_deadline(deadline)
 
-    # Convert string deadline to datetime object, then format it
-    try:
-        if isinstance(deadline, str):
-            deadline_obj = datetime.strptime(deadline, "%Y-%m-%d")
-        else:
-            deadline_obj = deadline
+    year = datetime.now().year
 
-        friendly_deadline = deadline_obj.strftime("%B %d, %Y")
-    except ValueError:
-        friendly_deadline = deadline
+    if raw:
+        # Headers and static markup are encoded once per campaign; only the
+        # recipient's name and address are spliced in here
+        with metrics.timer("render"):
+            message = get_raw_message(
+                SENDER, subject, scholarship_name, friendly_deadline, apply_link, year
+            ).render(recipient_list, name)
 
-    year = datetime.now().year
+        return _send_raw_message(
+            ses_client, recipient_list, message, stop_at, fail_over
+        )
 
-    html_body_content = template(
-        name, scholarship_name, friendly_deadline, apply_link, year
+    with metrics.timer("render"):
+        # Shared scholarship markup is rendered once per group and cached
+        html_template, text_template = get_scholarship_templates(
+            scholarship_name, friendly_deadline, apply_link, year
+        )
+        html_body_content = html_template.render(name)
+
+        # Plain-text version
+        text_body_content = text_template.render(name)
+
+    return _send_message(
+        ses_client,
+        recipient_list,
+        subject,
+        html_body_content,
+        text_body_content,
+        stop_at,
+        fail_over,
     )
 
-    # Plain-text version
-    text_body_content = template_plain_text(
-        name, scholarship_name, friendly_deadline, apply_link, year
+
+def send_digest_email(
+    ses_client,
+    recipient_list,
+    name,
+    scholarships,
+    stop_at=None,
+    raw=False,
+    fail_over=False,
+):
+    # Same as send_scholarship_email for a digest; scholarships is a tuple of
+    # (scholarship_name, friendly_deadline, apply_link) in the order listed
+    subject = f"🚨 URGENT: {len(scholarships)} Scholarship Deadlines Coming Up"
+    year = datetime.now().year
+
+    if raw:
+        # Recipients with the same scholarships share one encoded message
+        with metrics.timer("render"):
+            message = get_raw_digest_message(
+                SENDER, subject, scholarships, year
+            ).render(recipient_list, name)
+
+        return _send_raw_message(
+            ses_client, recipient_list, message, stop_at, fail_over
+        )
+
+    with metrics.timer("render"):
+        html_body_content = digest_template(name, scholarships, year)
+        text_body_content = digest_plain_text(name, scholarships, year)
+
+    return _send_message(
+        ses_client,
+        recipient_list,
+        subject,
+        html_body_content,
+        text_body_content,
+        stop_at,
+        fail_over,
     )
 
-    try:
-        response = ses_client.send_email(
-            Source=sender,
-            Destination={"ToAddresses": recipient_list},
-            Message={
-                "Subject": {"Data": subject, "Charset": "UTF-8"},
-                "Body": {
-                    "Text": {"Data": text_body_content, "Charset": "UTF-8"},
-                    "Html": {"Data": html_body_content, "Charset": "UTF-8"},
+
+def _send_message(
+    ses_client, recipient_list, subject, html, text, stop_at=None, fail_over=False
+):
+    def send():
+        with metrics.timer("rate_limit"):
+            wait_for_token(ses_client)
+        with metrics.ses_call():
+            return ses_client.send_email(
+                Source=SENDER,
+                Destination={"ToAddresses": recipient_list},
+                Message={
+                    "Subject": {"Data": subject, "Charset": "UTF-8"},
+                    "Body": {
+                        "Text": {"Data": text, "Charset": "UTF-8"},
+                        "Html": {"Data": html, "Charset": "UTF-8"},
+                    },
                 },
-            },
-        )
+            )
 
-        print(f"✅ Email sent successfully to {len(recipient_list)} recipients")
-        print(f"Message ID: {response['MessageId']}")
-        return response
+    return _send_with_retry(ses_client, send, recipient_list, stop_at, fail_over)
+
+
+def _send_raw_message(
+    ses_client, recipient_list, message, stop_at=None, fail_over=False
+):
+    def send():
+        with metrics.timer("rate_limit"):
+            wait_for_token(ses_client)
+        with metrics.ses_call():
+            return ses_client.send_raw_email(
+                Source=SENDER,
+                Destinations=recipient_list,
+                RawMessage={"Data": message},
+            )
+
+    return _send_with_retry(ses_client, send, recipient_list, stop_at, fail_over)
+
+
+def _send_with_retry(ses_client, send, recipient_list, stop_at=None, fail_over=False):
+    try:
+        response, attempts = call_with_retry(send, stop_at)
+
+        record_sent(ses_client, len(recipient_list))
+        log_buffer.record_sent(len(recipient_list))
+        log_buffer.debug(
+            "✅ Email sent to %s, Message ID: %s (attempts: %d)",
+            ", ".join(recipient_list),
+            response["MessageId"],
+            attempts,
+        )
+        return response, attempts
 
     except ClientError as e:
-        print(f"❌ Error sending email: {e.response['Error']['Code']}")
-        print(f"Error message: {e.response['Error']['Message']}")
-        return None
+        if fail_over and should_fail_over(e):
+            raise
+        log_buffer.record_failed(e.response["Error"]["Code"], len(recipient_list))
+        log_buffer.debug(
+            "❌ Error sending email to %s: %s: %s (attempts: %d)",
+            ", ".join(recipient_list),
+            e.response["Error"]["Code"],
+            e.response["Error"]["Message"],
+            e.attempts,
+        )
+        return None, e.attempts
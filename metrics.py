@@ -0,0 +1,183 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# One CloudWatch Embedded Metric Format line is printed per invocation
+METRICS_ENABLED = os.getenv("EMF_METRICS", "1") != "0"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "ScholarshipNotifier")
+
+# Phase timings in milliseconds, keyed by the name passed to timer()
+PHASE_METRICS = {
+    "parse": "ParseTime",
+    "validate": "ValidationTime",
+    "render": "RenderTime",
+    "rate_limit": "RateLimitWaitTime",
+    "serialize": "SerializeTime",
+}
+COUNT_METRICS = (
+    "Sent",
+    "Failed",
+    "Skipped",
+    "Pending",
+    "SesCalls",
+    "Throttles",
+    "Retries",
+    "Failovers",
+    "Digests",
+)
+# The count metric for each SendResult status
+STATUS_METRICS = {
+    "success": "Sent",
+    "failed": "Failed",
+    "skipped": "Skipped",
+    "pending": "Pending",
+}
+LATENCY_PERCENTILES = (50, 95, 99)
+
+# The invocation being recorded. A context variable, so concurrent requests
+# in the self-hosted server each record their own.
+_current = ContextVar("metrics_invocation", default=None)
+
+
+class InvocationMetrics:
+    # Thread-safe, since sends record from the worker pool
+
+    def __init__(self, **properties):
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(PHASE_METRICS.values(), 0.0)
+        self.counts = dict.fromkeys(COUNT_METRICS, 0)
+        self.latencies = []
+        self.properties = properties
+        self.lock = threading.Lock()
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.timings[PHASE_METRICS[phase]] += seconds * 1000
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def record_ses_latency(self, seconds):
+        with self.lock:
+            self.counts["SesCalls"] += 1
+            self.latencies.append(seconds * 1000)
+
+    def to_emf(self):
+        # Phase times are summed over worker threads, so with concurrency they
+        # can add up to more than the Duration
+        values = {"Duration": (time.perf_counter() - self.started) * 1000}
+        with self.lock:
+            values.update(self.timings)
+            values.update(self.counts)
+            latencies = sorted(self.latencies)
+
+        for percentile in LATENCY_PERCENTILES:
+            if latencies:
+                values[f"SesLatencyP{percentile}"] = nearest_rank(latencies, percentile)
+
+        units = {name: "Milliseconds" for name in values}
+        units.update({name: "Count" for name in COUNT_METRICS})
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["FunctionName"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": units[name]} for name in values
+                        ],
+                    }
+                ],
+            },
+            "FunctionName": os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local"),
+            **self.properties,
+            **{name: round(value, 3) for name, value in values.items()},
+        }
+
+
+def nearest_rank(sorted_values, percentile):
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def start_invocation(**properties):
+    invocation = InvocationMetrics(**properties)
+    _current.set(invocation)
+    return invocation
+
+
+def emit():
+    # Prints the EMF line for the current invocation and stops recording
+    invocation = _current.get()
+    _current.set(None)
+    if invocation is not None and METRICS_ENABLED:
+        print(json.dumps(invocation.to_emf(), separators=(",", ":")))
+
+
+def set_property(name, value):
+    # Extra, non-dimension fields on the EMF line, e.g. the delivery mode
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.properties[name] = value
+
+
+def context_map(executor, fn, *iterables):
+    # executor.map that runs every call in a copy of the caller's context, so
+    # worker threads record to the caller's invocation and log summary
+    context = copy_context()
+    return executor.map(lambda *args: context.copy().run(fn, *args), *iterables)
+
+
+@contextmanager
+def timer(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.add_time(phase, time.perf_counter() - started)
+
+
+def timed_iter(phase, iterable):
+    # Charges the time spent producing each item, e.g. incremental parsing
+    iterator = iter(iterable)
+    while True:
+        with timer(phase):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name, value=1):
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.count(name, value)
+
+
+def count_results(results):
+    # Every result is counted under its status, including rows rejected before
+    # any send, so the metrics add up to the response summary
+    for result in results:
+        count(STATUS_METRICS[result.status])
+
+
+@contextmanager
+def ses_call():
+    # Wall time of one SES API attempt, failed or not
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.record_ses_latency(time.perf_counter() - started)
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from botocore.exceptions import ClientError
+import log_buffer
+
+# How long a GetSendQuota answer is trusted before asking SES again
+QUOTA_TTL_SECONDS = float(os.getenv("SES_QUOTA_TTL", "300"))
+
+# Used when GetSendQuota is not allowed for the Lambda role
+FALLBACK_MAX_SEND_RATE = float(os.getenv("SES_MAX_SEND_RATE", "1"))
+
+_lock = threading.Lock()
+_quotas = {}
+_limiters = {}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = float(rate)
+            self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def acquire(self, tokens=1):
+        # Reserve the tokens up front and sleep off any deficit outside the lock,
+        # so concurrent senders queue up fairly instead of spinning
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _region(ses_client):
+    return ses_client.meta.region_name
+
+
+def get_send_quota(ses_client):
+    # Cached per region for the life of the warm container
+    region = _region(ses_client)
+    now = time.monotonic()
+
+    with _lock:
+        quota = _quotas.get(region)
+        if quota and now - quota["fetched_at"] < QUOTA_TTL_SECONDS:
+            return quota
+
+    try:
+        response = ses_client.get_send_quota()
+        quota = {
+            "max_send_rate": response["MaxSendRate"],
+            "max_24_hour_send": response["Max24HourSend"],
+            "sent_last_24_hours": response["SentLast24Hours"],
+            "fetched_at": now,
+        }
+    except ClientError as e:
+        log_buffer.warning(
+            "⚠️ Could not read SES send quota: %s", e.response["Error"]["Code"]
+        )
+        quota = {
+            "max_send_rate": FALLBACK_MAX_SEND_RATE,
+            "max_24_hour_send": -1,
+            "sent_last_24_hours": 0,
+            "fetched_at": now,
+        }
+
+    with _lock:
+        _quotas[region] = quota
+        limiter = _limiters.get(region)
+        if limiter:
+            limiter.set_rate(quota["max_send_rate"])
+
+    return quota
+
+
+def get_rate_limiter(ses_client):
+    region = _region(ses_client)
+    with _lock:
+        limiter = _limiters.get(region)
+    if limiter:
+        return limiter
+
+    quota = get_send_quota(ses_client)
+    with _lock:
+        return _limiters.setdefault(region, TokenBucket(quota["max_send_rate"]))
+
+
+def record_sent(ses_client, count=1):
+    # Keep the cached 24h counter honest between GetSendQuota refreshes. Called
+    # once SES has accepted the send, so throttled and failed attempts are not
+    # counted against the daily quota.
+    with _lock:
+        quota = _quotas.get(_region(ses_client))
+        if quota:
+            quota["sent_last_24_hours"] += count
+
+
+def remaining_daily_quota(ses_client):
+    # None means SES reported no daily limit
+    quota = get_send_quota(ses_client)
+    if quota["max_24_hour_send"] < 0:
+        return None
+
+    return max(0, int(quota["max_24_hour_send"] - quota["sent_last_24_hours"]))
+
+
+def wait_for_token(ses_client, count=1):
+    get_rate_limiter(ses_client).acquire(count)
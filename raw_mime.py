@@ -0,0 +1,85 @@
+import binascii
+import hashlib
+from email.header import Header
+from email.utils import formatdate
+
+# Ends the current quoted-printable line without adding a character, so
+# separately encoded pieces can be joined without re-encoding
+SOFT_BREAK = b"=\r\n"
+
+
+class RawMessageTemplate:
+    # A multipart/alternative message with everything except the recipient
+    # encoded once: headers, boundaries and the quoted-printable static markup.
+    # text and html are CompiledTemplates taking only the recipient name, e.g.
+    # the partials returned by template.bind_scholarship.
+
+    def __init__(self, sender, subject, text, html):
+        self.parts = (_encode_segments(text), _encode_segments(html))
+
+        # "=_" never occurs in quoted-printable output, so the boundary cannot
+        # collide with the body
+        digest = hashlib.sha256(
+            "\0".join((subject, text.source, html.source)).encode("utf-8")
+        ).hexdigest()[:24]
+        boundary = f"=_{digest}".encode("ascii")
+
+        self.headers = (
+            f"From: {sender}\r\n"
+            f"Subject: {_encode_header('Subject', subject)}\r\n"
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/alternative; boundary="{boundary.decode()}"\r\n'
+        ).encode("ascii")
+        self.part_headers = tuple(
+            b"\r\n--"
+            + boundary
+            + f"\r\nContent-Type: text/{subtype}; charset=UTF-8\r\n".encode("ascii")
+            + b"Content-Transfer-Encoding: quoted-printable\r\n\r\n"
+            for subtype in ("plain", "html")
+        )
+        self.closing = b"\r\n--" + boundary + b"--\r\n"
+
+    def render(self, to_addresses, name):
+        # Only the To/Date headers and the encoded name are built per recipient
+        encoded_name = _encode(str(name))
+        pieces = [
+            b"To: ",
+            ", ".join(to_addresses).encode("ascii"),
+            b"\r\nDate: ",
+            formatdate(usegmt=True).encode("ascii"),
+            b"\r\n",
+            self.headers,
+        ]
+        for part_header, chunks in zip(self.part_headers, self.parts):
+            pieces.append(part_header)
+            pieces.append(encoded_name.join(chunks))
+        pieces.append(self.closing)
+
+        return b"".join(pieces)
+
+    def size(self):
+        return len(self.headers) + sum(
+            len(chunk) for chunks in self.parts for chunk in chunks
+        )
+
+
+def _encode_segments(template):
+    # Encodes the static segments once and splits the body at each slot, so
+    # a render is a single join with the encoded name. NUL marks the slots
+    # while splitting; in the encoded text itself it is always escaped as =00.
+    slot_positions = {position for position, _ in template.slots}
+    encoded = SOFT_BREAK.join(
+        b"\0" if position in slot_positions else _encode(segment)
+        for position, segment in enumerate(template.segments)
+    )
+    return tuple(encoded.split(b"\0"))
+
+
+def _encode_header(name, value):
+    return Header(value, "utf-8", header_name=name).encode(linesep="\r\n")
+
+
+def _encode(text):
+    # Quoted-printable with CRLF line endings, as SendRawEmail expects
+    encoded = binascii.b2a_qp(text.encode("utf-8"), istext=True)
+    return encoded.replace(b"\n", b"\r\n")
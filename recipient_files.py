@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+from ses import get_session
+
+# Recipient files are read through a buffer of this size, so memory use does
+# not grow with the file
+READ_BUFFER_BYTES = int(os.getenv("RECIPIENT_READ_BUFFER", str(1024 * 1024)))
+
+# Local paths (for tests and self-hosting) must be inside this directory;
+# unset, only s3:// URIs are accepted
+RECIPIENT_FILE_ROOT = os.getenv("RECIPIENT_FILE_ROOT")
+
+FILE_FORMATS = ("csv", "ndjson")
+EXTENSION_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+_lock = threading.Lock()
+_s3_client = None
+
+
+def resolve_file_format(uri, file_format=None):
+    # Explicit format, else the file extension; None when neither is known
+    if file_format is not None:
+        return file_format if file_format in FILE_FORMATS else None
+    path = urlsplit(uri).path if "://" in uri else uri
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def iter_recipient_file(uri, file_format):
+    # The file is opened straight away, so a missing or forbidden file fails
+    # before anything is sent. Rows are then parsed one at a time.
+    stream = open_recipient_file(uri)
+    if file_format == "csv":
+        return _iter_csv(stream)
+    return _iter_ndjson(stream)
+
+
+def open_recipient_file(uri):
+    # Buffered binary stream over an s3://bucket/key object or a local path
+    url = urlsplit(uri)
+    if url.scheme == "s3":
+        key = url.path.lstrip("/")
+        if not url.netloc or not key:
+            raise ValueError(f"Expected s3://bucket/key, got {uri}")
+        body = _get_s3_client().get_object(Bucket=url.netloc, Key=key)["Body"]
+        return io.BufferedReader(_RawStream(body), buffer_size=READ_BUFFER_BYTES)
+
+    if url.scheme not in ("", "file"):
+        raise ValueError(f"Unsupported recipient file scheme: {url.scheme}")
+
+    path = url.path if url.scheme == "file" else uri
+    if not RECIPIENT_FILE_ROOT:
+        raise ValueError("Local recipient files are disabled")
+    root = os.path.realpath(RECIPIENT_FILE_ROOT)
+    path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath((root, path)) != root:
+        raise ValueError(f"{uri} is outside RECIPIENT_FILE_ROOT")
+
+    return open(path, "rb", buffering=READ_BUFFER_BYTES)
+
+
+def _iter_csv(stream):
+    # Header row names the fields; empty cells fall back to the defaults
+    with io.TextIOWrapper(stream, encoding="utf-8-sig", newline="") as text:
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                yield {
+                    field: value
+                    for field, value in row.items()
+                    if field and value not in (None, "")
+                }
+        except csv.Error as e:
+            # Raised as ValueError like a malformed NDJSON line
+            raise ValueError(f"line {reader.line_num}: {e}") from e
+
+
+def _iter_ndjson(stream):
+    # One JSON document per line; blank lines are ignored
+    with io.TextIOWrapper(stream, encoding="utf-8-sig") as text:
+        for line in text:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _get_s3_client():
+    global _s3_client
+    with _lock:
+        if _s3_client is None:
+            # Same credentials as the SES client
+            _s3_client = get_session().create_client(
+                "s3",
+                aws_access_key_id=os.getenv("ACCESS_KEY"),
+                aws_secret_access_key=os.getenv("SECRET_KEY"),
+            )
+    return _s3_client
+
+
+class _RawStream(io.RawIOBase):
+    # Lets io.BufferedReader pull from a botocore StreamingBody
+
+    def __init__(self, body):
+        self.body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.body.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.body.close()
+        super().close()
@@ -0,0 +1,136 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from results import SendResult
+
+# Pragmatic RFC 5322 subset: dot-atom local part and a dotted hostname
+EMAIL_PATTERN = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z](?:[a-z0-9-]{0,61}[a-z0-9])"
+)
+
+SCHOLARSHIP_DEFAULTS = {
+    "scholarship_name": "Scholarship Program",
+    "deadline": "2025-12-31",
+    "apply_link": "https://eduvision.live",
+}
+SCHOLARSHIP_KEY_FIELDS = ("scholarship_name", "deadline")
+
+
+def normalize_email(email):
+    # Returns the lowercased address, or None when it is not a valid email
+    if not isinstance(email, str):
+        return None
+
+    email = email.strip().lower()
+    if len(email) > 254 or not EMAIL_PATTERN.fullmatch(email):
+        return None
+
+    return email
+
+
+def format_deadline(deadline):
+    # Convert string deadline to datetime object, then format it
+    if isinstance(deadline, str):
+        return _format_date_string(deadline)
+
+    try:
+        return deadline.strftime("%B %d, %Y")
+    except AttributeError:
+        return deadline
+
+
+def deadline_sort_key(deadline):
+    # YYYY-MM-DD deadlines sort by date, ahead of any other format
+    if isinstance(deadline, str):
+        try:
+            return (0, datetime.strptime(deadline, "%Y-%m-%d").date().isoformat())
+        except ValueError:
+            pass
+    return (1, str(deadline))
+
+
+@lru_cache(maxsize=1024)
+def _format_date_string(deadline):
+    # Memoized, since a batch usually only has a handful of distinct deadlines
+    try:
+        return datetime.strptime(deadline, "%Y-%m-%d").strftime("%B %d, %Y")
+    except ValueError:
+        return deadline
+
+
+def normalize_recipients(
+    rows,
+    defaults=SCHOLARSHIP_DEFAULTS,
+    key_fields=SCHOLARSHIP_KEY_FIELDS,
+    seen=None,
+    suppressed=(),
+):
+    # Single pass over (index, recipient_data) rows. Returns the recipients that
+    # are safe to send to and the results for rows rejected before any SES call.
+    # Rows repeating an (email, *key_fields) combination are skipped; pass the
+    # same seen dict to carry that check across chunks. Addresses in
+    # suppressed (e.g. a SuppressionIndex) are skipped without calling SES.
+    seen = {} if seen is None else seen
+    recipients = []
+    rejected = []
+
+    for i, recipient_data in rows:
+        if not isinstance(recipient_data, dict):
+            rejected.append(
+                SendResult(
+                    i,
+                    f"Student {i+1}",
+                    "unknown",
+                    "failed",
+                    error="Recipient must be an object",
+                )
+            )
+            continue
+
+        name = recipient_data.get("name", f"Student {i+1}")
+        raw_email = recipient_data.get("email")
+
+        if not raw_email:
+            rejected.append(
+                SendResult(i, name, None, "failed", error="Email address is required")
+            )
+            continue
+
+        email = normalize_email(raw_email)
+        if email is None:
+            rejected.append(
+                SendResult(i, name, raw_email, "failed", error="Invalid email address")
+            )
+            continue
+
+        if email in suppressed:
+            rejected.append(
+                SendResult(i, name, email, "skipped", error="Suppressed address")
+            )
+            continue
+
+        recipient = {"index": i, "name": name, "email": email}
+        for field, default in defaults.items():
+            recipient[field] = recipient_data.get(field, default)
+        if "deadline" in recipient:
+            recipient["friendly_deadline"] = format_deadline(recipient["deadline"])
+
+        key = (email,) + tuple(str(recipient[field]) for field in key_fields)
+        if key in seen:
+            rejected.append(
+                SendResult(
+                    i,
+                    name,
+                    email,
+                    "skipped",
+                    error="Duplicate recipient",
+                    duplicate_of=seen[key],
+                )
+            )
+            continue
+
+        seen[key] = i
+        recipients.append(recipient)
+
+    return recipients, rejected
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from botocore.exceptions import ClientError
+import log_buffer
+import metrics
+from ses import DEFAULT_REGION, get_ses_client
+from rate_limiter import get_send_quota, remaining_daily_quota
+from retry import TERMINAL_MESSAGES, is_retryable
+
+# Sends are spread over these regions in proportion to each one's MaxSendRate,
+# so the total rate is the sum of the regions' rates
+SES_REGIONS = [
+    region.strip()
+    for region in os.getenv("SES_REGIONS", DEFAULT_REGION).split(",")
+    if region.strip()
+]
+
+# A region that throttles or errors after its retries gets no new sends for
+# this many seconds, unless every region is in the same state
+REGION_COOLDOWN_SECONDS = float(os.getenv("SES_REGION_COOLDOWN", "30"))
+
+_lock = threading.Lock()
+_pool = None
+
+
+class RegionPool:
+    # Smooth weighted round-robin over one SES client per region: a region
+    # with twice the MaxSendRate gets every other send, evenly interleaved.
+    # Regions out of daily quota or cooling down after a failure are skipped.
+
+    def __init__(self, clients):
+        self.clients = list(clients)
+        self.current = [0.0] * len(self.clients)
+        self.down_until = [0.0] * len(self.clients)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.clients)
+
+    def pick(self, exclude=()):
+        # Next client to send through, or None when every one is excluded
+        if len(self.clients) == 1:
+            return None if self.clients[0] in exclude else self.clients[0]
+
+        candidates = [
+            i for i, client in enumerate(self.clients) if client not in exclude
+        ]
+        if not candidates:
+            return None
+
+        # Quotas are cached by the rate limiter, so this is rarely a call to SES
+        weights = {i: self.weight(self.clients[i]) for i in candidates}
+
+        with self.lock:
+            now = time.monotonic()
+            usable = [i for i in candidates if self.down_until[i] <= now] or candidates
+            if any(weights[i] > 0 for i in usable):
+                usable = [i for i in usable if weights[i] > 0]
+            else:
+                weights = dict.fromkeys(usable, 1.0)
+
+            for i in usable:
+                self.current[i] += weights[i]
+            best = max(usable, key=lambda i: self.current[i])
+            self.current[best] -= sum(weights[i] for i in usable)
+
+        return self.clients[best]
+
+    def weight(self, client):
+        if remaining_daily_quota(client) == 0:
+            return 0.0
+        return float(get_send_quota(client)["max_send_rate"])
+
+    def mark_failed(self, client):
+        with self.lock:
+            index = self.clients.index(client)
+            self.down_until[index] = time.monotonic() + REGION_COOLDOWN_SECONDS
+
+    def remaining_daily_quota(self):
+        # Sum over regions; None when any region reports no daily limit
+        total = 0
+        for client in self.clients:
+            remaining = remaining_daily_quota(client)
+            if remaining is None:
+                return None
+            total += remaining
+        return total
+
+
+def get_region_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = RegionPool(get_ses_client(region) for region in SES_REGIONS)
+        return _pool
+
+
+def set_region_pool(clients):
+    # Replaces the configured regions, e.g. with stub clients in tests
+    global _pool
+    with _lock:
+        _pool = RegionPool(clients)
+        return _pool
+
+
+def should_fail_over(error):
+    # Throttling, 5xx and connection errors that outlasted the retries, and an
+    # exhausted daily quota, are worth trying in another region. Rejected
+    # messages or addresses would fail there too.
+    if is_retryable(error):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    message = error.response.get("Error", {}).get("Message", "").lower()
+    return any(terminal in message for terminal in TERMINAL_MESSAGES)
+
+
+def send_with_failover(pool, email, send, stop_at=None):
+    # Calls send(ses_client, fail_over) with a client from pool. A region that
+    # throttles or errors is cooled down and the send moves to the next one;
+    # the last region left reports the failure as before.
+    ses_client = pool.pick()
+    tried = []
+    while True:
+        tried.append(ses_client)
+        fail_over = len(tried) < len(pool)
+        try:
+            return send(ses_client, fail_over)
+        except Exception as e:
+            if not (fail_over and should_fail_over(e)) or (
+                stop_at is not None and time.monotonic() >= stop_at
+            ):
+                raise
+            pool.mark_failed(ses_client)
+            metrics.count("Failovers")
+            log_buffer.debug(
+                "↪️ Failing over %s from %s: %s", email, region_name(ses_client), e
+            )
+            ses_client = pool.pick(exclude=tried)
+
+
+def region_name(client):
+    return client.meta.region_name
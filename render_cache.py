@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from template import bind_digest, bind_scholarship
+
+# Upper bound on the pre-rendered bodies kept by a warm container
+MAX_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+
+class RenderCache:
+    # LRU cache bounded by the total size of its values rather than entry count
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_create(self, key, create, sizeof):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            # Created under the lock so concurrent senders render each group once
+            self.misses += 1
+            value = create()
+            size = sizeof(value)
+            if size > self.max_bytes:
+                return value
+
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+            return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_cache = RenderCache(MAX_CACHE_BYTES)
+
+
+def get_scholarship_templates(scholarship_name, friendly_deadline, apply_link, year):
+    # Recipients of the same scholarship share one render; only the name differs
+    key = (scholarship_name, friendly_deadline, apply_link, year)
+    return _cache.get_or_create(
+        key,
+        lambda: bind_scholarship(scholarship_name, friendly_deadline, apply_link, year),
+        lambda templates: sum(len(t.source.encode("utf-8")) for t in templates),
+    )
+
+
+def get_raw_message(
+    sender, subject, scholarship_name, friendly_deadline, apply_link, year
+):
+    # Pre-encoded MIME message for SendRawEmail, built from the cached renders.
+    # raw_mime pulls in the email package, so only raw delivery imports it.
+    from raw_mime import RawMessageTemplate
+
+    html, text = get_scholarship_templates(
+        scholarship_name, friendly_deadline, apply_link, year
+    )
+    key = (
+        "raw",
+        sender,
+        subject,
+        scholarship_name,
+        friendly_deadline,
+        apply_link,
+        year,
+    )
+    return _cache.get_or_create(
+        key,
+        lambda: RawMessageTemplate(sender, subject, text, html),
+        lambda message: message.size(),
+    )
+
+
+def get_raw_digest_message(sender, subject, scholarships, year):
+    # Digest counterpart of get_raw_message; recipients with the same
+    # scholarships share one encoded message
+    from raw_mime import RawMessageTemplate
+
+    def create():
+        html, text = bind_digest(scholarships, year)
+        return RawMessageTemplate(sender, subject, text, html)
+
+    key = ("raw-digest", sender, subject, tuple(scholarships), year)
+    return _cache.get_or_create(key, create, lambda message: message.size())
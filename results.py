@@ -0,0 +1,125 @@
+import os
+
+# "full" returns every result, "failures_only" just the failed ones, and
+# "summary" only counts plus the failed indexes
+RESPONSE_MODES = ("full", "failures_only", "summary")
+DEFAULT_RESPONSE_MODE = os.getenv("RESPONSE_MODE", "full")
+
+
+class SendResult:
+    # One per recipient row; slots keep large batches small in memory
+    __slots__ = (
+        "index",
+        "name",
+        "email",
+        "status",
+        "message_id",
+        "error",
+        "attempts",
+        "duplicate_of",
+    )
+
+    def __init__(
+        self,
+        index,
+        name,
+        email,
+        status,
+        message_id=None,
+        error=None,
+        attempts=None,
+        duplicate_of=None,
+    ):
+        self.index = index
+        self.name = name
+        self.email = email
+        self.status = status
+        self.message_id = message_id
+        self.error = error
+        self.attempts = attempts
+        self.duplicate_of = duplicate_of
+
+    def to_dict(self):
+        # Same shape the handler has always returned; unset fields are omitted
+        result = {"index": self.index, "name": self.name}
+        if self.email is not None:
+            result["email"] = self.email
+        result["status"] = self.status
+        if self.message_id is not None:
+            result["messageId"] = self.message_id
+        if self.error is not None:
+            result["error"] = self.error
+        if self.attempts is not None:
+            result["attempts"] = self.attempts
+        if self.duplicate_of is not None:
+            result["duplicateOf"] = self.duplicate_of
+        return result
+
+    @classmethod
+    def from_dict(cls, result):
+        return cls(
+            result["index"],
+            result["name"],
+            result.get("email"),
+            result["status"],
+            message_id=result.get("messageId"),
+            error=result.get("error"),
+            attempts=result.get("attempts"),
+            duplicate_of=result.get("duplicateOf"),
+        )
+
+    @classmethod
+    def for_recipient(cls, recipient, status, **fields):
+        return cls(
+            recipient["index"], recipient["name"], recipient["email"], status, **fields
+        )
+
+
+class ResultCollector:
+    # Accumulates results in index order, keeping only what the response mode
+    # will return, so summary mode never holds per-recipient records
+
+    def __init__(self, mode="full"):
+        self.mode = mode
+        self.total = 0
+        self.counts = {"success": 0, "failed": 0, "skipped": 0, "pending": 0}
+        self.results = []
+        self.failed_indexes = []
+        self.pending_indexes = []
+
+    def add(self, result):
+        self.total += 1
+        self.counts[result.status] += 1
+
+        if result.status == "failed":
+            self.failed_indexes.append(result.index)
+        elif result.status == "pending":
+            self.pending_indexes.append(result.index)
+
+        if self.mode == "full" or (
+            self.mode == "failures_only" and result.status == "failed"
+        ):
+            self.results.append(result)
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    def payload(self):
+        # Response fields describing the results for the selected mode
+        summary = {
+            "total": self.total,
+            "successful": self.counts["success"],
+            "failed": self.counts["failed"],
+            "skipped": self.counts["skipped"],
+        }
+        if self.counts["pending"]:
+            summary["pending"] = self.counts["pending"]
+
+        if self.mode == "summary":
+            return {"summary": summary, "failedIndexes": self.failed_indexes}
+
+        return {
+            "summary": summary,
+            "results": [result.to_dict() for result in self.results],
+        }
@@ -0,0 +1,83 @@
+import os
+import random
+import time
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+import metrics
+
+MAX_ATTEMPTS = int(os.getenv("SES_MAX_ATTEMPTS", "4"))
+BASE_DELAY_SECONDS = float(os.getenv("SES_RETRY_BASE_DELAY", "0.2"))
+MAX_DELAY_SECONDS = float(os.getenv("SES_RETRY_MAX_DELAY", "5"))
+
+RETRYABLE_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestTimeout",
+    "ServiceUnavailable",
+    "InternalFailure",
+    "InternalError",
+}
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+
+# SES reports an exhausted daily quota with the Throttling code; waiting a few
+# seconds will not help, so it is treated as terminal
+TERMINAL_MESSAGES = ("daily message quota exceeded",)
+
+
+def is_retryable(error):
+    if isinstance(
+        error, (ConnectionClosedError, EndpointConnectionError, ReadTimeoutError)
+    ):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+
+    message = error.response.get("Error", {}).get("Message", "").lower()
+    if any(terminal in message for terminal in TERMINAL_MESSAGES):
+        return False
+
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+    return code in RETRYABLE_ERROR_CODES or status >= 500
+
+
+def is_throttle(error):
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+def call_with_retry(call, stop_at=None, max_attempts=MAX_ATTEMPTS):
+    # Returns (response, attempts). On failure the last error is raised with an
+    # attempts attribute. stop_at is a time.monotonic() value after which no
+    # further attempt is started, e.g. the end of the Lambda time budget.
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return call(), attempt
+        except Exception as e:
+            e.attempts = attempt
+            if is_throttle(e):
+                metrics.count("Throttles")
+            if attempt >= max_attempts or not is_retryable(e):
+                raise
+
+            # Exponential backoff with full jitter
+            delay = random.uniform(
+                0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+            )
+            if stop_at is not None and time.monotonic() + delay >= stop_at:
+                raise
+
+            metrics.count("Retries")
+            time.sleep(delay)
@@ -1,15 +1,12 @@
-import boto3
-import os
 from dotenv import load_dotenv
 
+# Loaded before ses, which reads its settings at import
 load_dotenv()
 
-ses_client = boto3.client(
-    "ses",
-    region_name="ap-southeast-1",
-    aws_access_key_id=os.getenv('ACCESS_KEY'),
-    aws_secret_access_key=os.getenv('SECRET_KEY')
-)
+from ses import get_ses_client  # noqa: E402
+
+# Shared SES client
+ses_client = get_ses_client()
 
 # Check domain verification status
 response = ses_client.get_identity_verification_attributes(
@@ -1,42 +1,20 @@
-import boto3
-import os
 from dotenv import load_dotenv
 from datetime import datetime
 from botocore.exceptions import ClientError
 
+# Loaded before the shared modules, which read their settings at import
 load_dotenv()
 
-# SES client
-ses_client = boto3.client(
-    "ses",
-    region_name="ap-southeast-1",
-    aws_access_key_id=os.getenv("ACCESS_KEY"),
-    aws_secret_access_key=os.getenv("SECRET_KEY"),
-)
-
-
-def send_scholarship_email(
-    recipient_list, name, scholarship_name, deadline, apply_link
-):
-    sender = "noreply@eduvision.live"
-    subject = f"Scholarship Opportunity: {scholarship_name}"
-
-    # Convert string deadline to datetime object, then format it
-    try:
-        if isinstance(deadline, str):
-            # Parse the string date (assuming format: "YYYY-MM-DD")
-            deadline_obj = datetime.strptime(deadline, "%Y-%m-%d")
-        else:
-            deadline_obj = deadline
-        
-        friendly_deadline = deadline_obj.strftime("%B %d, %Y")  # "October 11, 2025"
-    except ValueError:
-        # If parsing fails, use the original string
-        friendly_deadline = deadline
+from rate_limiter import record_sent, wait_for_token  # noqa: E402
+from retry import call_with_retry  # noqa: E402
+from ses import get_ses_client  # noqa: E402
+from compiled_template import CompiledTemplate  # noqa: E402
+from html_optimizer import optimize_template  # noqa: E402
 
-    year = datetime.now().year
+# Shared SES client
+ses_client = get_ses_client()
 
-    html_body = f"""
+HTML_SOURCE = """
     <html>
     <head>
         <style>
@@ -165,6 +143,41 @@ def send_scholarship_email(
     </html>
     """
 
+# Minified with the CSS inlined; see html_optimizer.py
+_html = optimize_template(
+    "send_template",
+    CompiledTemplate(
+        HTML_SOURCE,
+        ("name", "scholarship_name", "friendly_deadline", "apply_link", "year"),
+    ),
+)
+
+
+def send_scholarship_email(
+    recipient_list, name, scholarship_name, deadline, apply_link
+):
+    sender = "noreply@eduvision.live"
+    subject = f"Scholarship Opportunity: {scholarship_name}"
+
+    # Convert string deadline to datetime object, then format it
+    try:
+        if isinstance(deadline, str):
+            # Parse the string date (assuming format: "YYYY-MM-DD")
+            deadline_obj = datetime.strptime(deadline, "%Y-%m-%d")
+        else:
+            deadline_obj = deadline
+
+        friendly_deadline = deadline_obj.strftime("%B %d, %Y")  # "October 11, 2025"
+    except ValueError:
+        # If parsing fails, use the original string
+        friendly_deadline = deadline
+
+    year = datetime.now().year
+
+    html_body = _html.render(
+        name, scholarship_name, friendly_deadline, apply_link, year
+    )
+
     # Plain-text version
     text_body = f"""
     Scholarship Opportunity: {scholarship_name}
@@ -183,7 +196,8 @@ def send_scholarship_email(
     EduVision Team
     """
 
-    try:
+    def send():
+        wait_for_token(ses_client)
         response = ses_client.send_email(
             Source=sender,
             Destination={"ToAddresses": recipient_list},
@@ -195,14 +209,20 @@ def send_scholarship_email(
                 },
             },
         )
+        record_sent(ses_client, len(recipient_list))
+        return response
 
+    try:
+        response, attempts = call_with_retry(send)
         print("✅ Email sent successfully!")
-        print(f"Message ID: {response['MessageId']}")
+        print(f"Message ID: {response['MessageId']} (attempts: {attempts})")
         return response
 
     except ClientError as e:
         print(f"❌ Error sending email: {e.response['Error']['Code']}")
-        print(f"Error message: {e.response['Error']['Message']}")
+        print(
+            f"Error message: {e.response['Error']['Message']} (attempts: {e.attempts})"
+        )
         return None
 
 
@@ -0,0 +1,231 @@
+# Self-hosted HTTP server for running the notifier outside Lambda. Requests
+# are read on one asyncio event loop with HTTP/1.1 keep-alive, turned into
+# API Gateway proxy events and answered with whatever lambda_handler returns.
+#
+#   python server.py [--host 0.0.0.0] [--port 8080]
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from urllib.parse import parse_qsl, urlsplit
+
+import main
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+
+# Handler calls in flight at once; each one blocks a worker thread on SES
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "32"))
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT_SECONDS = float(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+
+# Same role as the Lambda timeout: sends stop early and unsent rows come back
+# with a continuation token
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT", "900"))
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    206: "Partial Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    411: "Length Required",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class RequestContext:
+    # The parts of the Lambda context object the handler reads
+
+    def __init__(self, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+class HandlerServer:
+    # Parsing and keep-alive stay on the event loop. lambda_handler and its
+    # blocking SES calls run on a thread pool, so a slow send never stalls
+    # the other connections.
+
+    def __init__(self, handler=None, workers=SERVER_WORKERS):
+        self.handler = handler or main.lambda_handler
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="handler"
+        )
+
+    async def dispatch(self, event):
+        # Each request gets a fresh context, so concurrent requests record
+        # their own metrics and log summary
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, copy_context().run, self.handler, event, RequestContext()
+        )
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        read_request(reader), KEEPALIVE_TIMEOUT_SECONDS
+                    )
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except RequestError as e:
+                    writer.write(error_response(e.status_code, str(e)))
+                    break
+
+                method, target, version, headers, body = request
+                keep_alive = wants_keep_alive(version, headers)
+
+                if method != "POST":
+                    response = json_response(
+                        405,
+                        {"success": False, "error": "Method Not Allowed"},
+                        {"Allow": "POST"},
+                    )
+                else:
+                    response = await self.dispatch(to_event(target, headers, body))
+
+                writer.write(serialize_response(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT, ready=None):
+        server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_HEADER_BYTES
+        )
+        if ready is not None:
+            ready(server.sockets[0].getsockname())
+        async with server:
+            await server.serve_forever()
+
+
+class RequestError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def read_request(reader):
+    # Returns (method, target, version, headers, body) for one HTTP/1.1 request
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise RequestError(431, "Request headers are too large")
+
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = request_line.split(" ")
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip()] = value.strip()
+    lowered = {name.lower(): value for name, value in headers.items()}
+
+    if "chunked" in lowered.get("transfer-encoding", "").lower():
+        raise RequestError(411, "Chunked bodies are not supported")
+    try:
+        length = int(lowered.get("content-length", "0"))
+    except ValueError:
+        raise RequestError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"Body exceeds {MAX_BODY_BYTES} bytes")
+
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+def wants_keep_alive(version, headers):
+    # HTTP/1.1 keeps the connection open unless asked not to; 1.0 the reverse
+    connection = next(
+        (value for name, value in headers.items() if name.lower() == "connection"),
+        "",
+    ).lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def to_event(target, headers, body):
+    # API Gateway proxy event, as lambda_handler receives it behind Lambda
+    url = urlsplit(target)
+    return {
+        "httpMethod": "POST",
+        "path": url.path,
+        "headers": headers,
+        "queryStringParameters": dict(parse_qsl(url.query)) or None,
+        "body": body.decode("utf-8", errors="replace"),
+        "isBase64Encoded": False,
+    }
+
+
+def json_response(status_code, payload, headers=None):
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": json.dumps(payload),
+    }
+
+
+def error_response(status_code, message):
+    response = json_response(
+        status_code,
+        {"success": False, "error": REASONS[status_code], "message": message},
+    )
+    return serialize_response(response, keep_alive=False)
+
+
+def serialize_response(response, keep_alive):
+    body = response.get("body", "").encode("utf-8")
+    status_code = response["statusCode"]
+    lines = [f"HTTP/1.1 {status_code} {REASONS.get(status_code, 'Unknown')}"]
+    lines.extend(
+        f"{name}: {value}" for name, value in (response.get("headers") or {}).items()
+    )
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def run(host=SERVER_HOST, port=SERVER_PORT):
+    server = HandlerServer()
+    print(f"Listening on http://{host}:{port}")
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-hosted scholarship notifier")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    run(args.host, args.port)
@@ -0,0 +1,54 @@
+import os
+import threading
+import botocore.session
+from botocore.config import Config
+
+DEFAULT_REGION = os.getenv("SES_REGION", "ap-southeast-1")
+
+# One pooled connection per concurrent sender, so workers never queue for a socket
+MAX_POOL_CONNECTIONS = int(os.getenv("SES_MAX_POOL_CONNECTIONS", "32"))
+
+_lock = threading.Lock()
+_clients = {}
+_session = None
+
+
+def get_ses_client(region_name=None):
+    # Clients are created once per region and reused by every warm invocation,
+    # which keeps credentials, endpoints and open TLS connections around
+    region_name = region_name or DEFAULT_REGION
+
+    with _lock:
+        client = _clients.get(region_name)
+        if client is None:
+            client = _clients[region_name] = _create_client(region_name)
+
+    return client
+
+
+def get_session():
+    # botocore directly rather than boto3, which also imports s3transfer and
+    # the resource layer on every cold start. One session shares the loaded
+    # service and endpoint data between regions and services.
+    global _session
+    if _session is None:
+        _session = botocore.session.get_session()
+    return _session
+
+
+def _create_client(region_name):
+    # Retries are handled by retry.call_with_retry, so botocore's own are off
+    config = Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={"mode": "standard", "max_attempts": 1},
+    )
+
+    # Local scripts authenticate with keys from .env, Lambda uses its role
+    return get_session().create_client(
+        "ses",
+        region_name=region_name,
+        aws_access_key_id=os.getenv("ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("SECRET_KEY"),
+        config=config,
+    )
@@ -0,0 +1,77 @@
+import json
+from itertools import islice
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def chunked(iterable, size):
+    # Yields lists of at most size items without materializing the iterable
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_ndjson(text):
+    # One JSON document per line; blank lines are ignored
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+
+        line = text[start:end].strip()
+        if line:
+            yield json.loads(line)
+        start = end + 1
+
+
+def iter_json_array(text, key, options):
+    # Yields the elements of text[key] one at a time, where text is a JSON
+    # object. Other top-level fields are stored in options as they are reached,
+    # so fields placed before the array are available while it is consumed.
+    pos = _expect(text, _skip(text, 0), "{")
+    pos = _skip(text, pos)
+    if text.startswith("}", pos):
+        return
+
+    while True:
+        field, pos = _decoder.raw_decode(text, pos)
+        pos = _expect(text, _skip(text, pos), ":")
+        pos = _skip(text, pos)
+
+        if field == key and text.startswith("[", pos):
+            pos = _skip(text, pos + 1)
+            if text.startswith("]", pos):
+                pos += 1
+            else:
+                while True:
+                    item, pos = _decoder.raw_decode(text, pos)
+                    yield item
+                    pos = _skip(text, pos)
+                    if text.startswith("]", pos):
+                        pos += 1
+                        break
+                    pos = _skip(text, _expect(text, pos, ","))
+        else:
+            options[field], pos = _decoder.raw_decode(text, pos)
+
+        pos = _skip(text, pos)
+        if text.startswith("}", pos):
+            return
+        pos = _skip(text, _expect(text, pos, ","))
+
+
+def _skip(text, pos):
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _expect(text, pos, char):
+    if not text.startswith(char, pos):
+        raise json.JSONDecodeError(f"Expecting '{char}'", text, pos)
+    return pos + 1
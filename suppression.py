@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from botocore.exceptions import ClientError
+from recipients import normalize_email
+import log_buffer
+
+# Addresses that bounced or complained, one per line; a local path or an
+# s3:// URI. Unset, only addresses learned from SES notifications are skipped.
+SUPPRESSION_LIST = os.getenv("SUPPRESSION_LIST")
+
+# Warm containers reload the list after this many seconds
+SUPPRESSION_TTL_SECONDS = float(os.getenv("SUPPRESSION_TTL", "300"))
+
+_lock = threading.Lock()
+_index = None
+_loaded_at = 0.0
+
+# Addresses from bounce and complaint notifications handled by this container,
+# re-applied whenever the list is reloaded
+_learned = set()
+
+
+class SuppressionIndex:
+    # Sorted array of 64-bit address hashes: 8 bytes per address, and a lookup
+    # is one hash plus a C-level binary search. A false match needs a 64-bit
+    # collision, which is far less likely than a mistyped list entry.
+
+    def __init__(self, emails=()):
+        self.hashes = array("Q", sorted({_hash(email) for email in emails}))
+        self.extra = set()
+
+    def __contains__(self, email):
+        value = _hash(email)
+        position = bisect_left(self.hashes, value)
+        if position < len(self.hashes) and self.hashes[position] == value:
+            return True
+        return value in self.extra
+
+    def __len__(self):
+        return len(self.hashes) + len(self.extra)
+
+    def add(self, email):
+        # Additions between reloads; the sorted array is rebuilt on reload
+        if email not in self:
+            self.extra.add(_hash(email))
+
+
+def get_suppression_index():
+    # Cached across warm invocations and reloaded every SUPPRESSION_TTL
+    global _index, _loaded_at
+    now = time.monotonic()
+    with _lock:
+        if _index is not None and now - _loaded_at < SUPPRESSION_TTL_SECONDS:
+            return _index
+
+    try:
+        index = SuppressionIndex(
+            _read_list(SUPPRESSION_LIST) if SUPPRESSION_LIST else ()
+        )
+    except (OSError, ValueError, ClientError) as e:
+        # Keep sending with the last good list and try again after the TTL
+        log_buffer.warning("⚠️ Could not load suppression list: %s", e)
+        index = _index or SuppressionIndex()
+
+    with _lock:
+        for email in _learned:
+            index.add(email)
+        _index, _loaded_at = index, now
+        return index
+
+
+def is_ses_notification(event):
+    # SES bounce and complaint notifications arrive through an SNS topic
+    records = event.get("Records")
+    return bool(records) and all(
+        record.get("EventSource") == "aws:sns" for record in records
+    )
+
+
+def record_notifications(event):
+    # Adds permanently bounced and complaining addresses to the index and
+    # returns them. Transient bounces, e.g. a full mailbox, are not suppressed.
+    suppressed = []
+    for record in event["Records"]:
+        message = json.loads(record["Sns"]["Message"])
+        notification_type = message.get("notificationType") or message.get("eventType")
+        if notification_type == "Bounce":
+            bounce = message.get("bounce", {})
+            if bounce.get("bounceType") == "Permanent":
+                suppressed.extend(
+                    r["emailAddress"] for r in bounce.get("bouncedRecipients", [])
+                )
+        elif notification_type == "Complaint":
+            suppressed.extend(
+                r["emailAddress"]
+                for r in message.get("complaint", {}).get("complainedRecipients", [])
+            )
+
+    suppressed = [email for email in map(normalize_email, suppressed) if email]
+    index = get_suppression_index()
+    with _lock:
+        for email in suppressed:
+            _learned.add(email)
+            index.add(email)
+
+    return suppressed
+
+
+def _read_list(uri):
+    # One address per line; blank lines and # comments are ignored
+    if uri.startswith("s3://"):
+        from recipient_files import open_recipient_file
+
+        stream = open_recipient_file(uri)
+    else:
+        stream = open(uri, "rb")
+
+    with stream:
+        for line in stream:
+            email = normalize_email(line.decode("utf-8").strip())
+            if email:
+                yield email
+
+
+def _hash(email):
+    return int.from_bytes(
+        hashlib.blake2b(email.encode("utf-8"), digest_size=8).digest(), "little"
+    )
@@ -1,13 +1,12 @@
-def template(name, scholarship_name, friendly_deadline, apply_link, year):
+from compiled_template import CompiledTemplate
+from html_optimizer import optimize_template
 
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Scholarship Opportunity - {scholarship_name}</title>
-        <style>
+FIELDS = ("name", "scholarship_name", "friendly_deadline", "apply_link", "year")
+DIGEST_FIELDS = ("name", "scholarship_count", "scholarships", "year")
+DIGEST_ITEM_FIELDS = ("scholarship_name", "friendly_deadline", "apply_link")
+
+# Shared by the scholarship and digest emails
+STYLE_SOURCE = """<style>
             @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
             
             * {{
@@ -169,7 +168,17 @@ def template(name, scholarship_name, friendly_deadline, apply_link, year):
                     padding: 20px;
                 }}
             }}
-        </style>
+        </style>"""
+
+_DOCUMENT_START = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>"""
+
+_HEADER = "</title>\n        " + STYLE_SOURCE + """
     </head>
     <body>
         <div class="email-container">
@@ -177,7 +186,31 @@ def template(name, scholarship_name, friendly_deadline, apply_link, year):
                 <img src="https://pub-19a672e964fd4f28b0edebb5b4c986a9.r2.dev/logo-nobg.png" alt="EduVision Logo" draggable="false" style="user-select:none; -webkit-user-drag:none;">
             </div>
             
-            <div class="content">
+            <div class="content">"""
+
+_FOOTER = """                <div class="additional-info">
+                    <h3>💡 Need Help?</h3>
+                    <p>• Questions about the application? Email us at <a href="mailto:support@eduvision.live">support@eduvision.live</a></p>
+                    <p>• Browse more scholarships: <a href="https://eduvision.live/scholarships" target="_blank">EduVision Scholarships</a></p>
+                    <p>• Application tips and resources available on our website</p>
+                </div>
+                
+                <p style="margin-top: 32px;">Best of luck with your application!</p>
+                <p><strong>The EduVision Team</strong></p>
+            </div>
+            
+            <div class="footer">
+                <p>© {year} EduVision. All rights reserved.</p>
+                <p>Helping students find and secure educational funding worldwide.</p>
+                <p><a href="https://eduvision.live">Visit our website</a> | <a href="mailto:support@eduvision.live">Contact support</a></p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+HTML_SOURCE = (
+    _DOCUMENT_START + "Scholarship Opportunity - {scholarship_name}" + _HEADER + """
                 <div class="greeting">
                     Greeting {name}! 👋
                 </div>
@@ -208,32 +241,18 @@ def template(name, scholarship_name, friendly_deadline, apply_link, year):
                     ">🚀 Apply Now</a>
                 </div>
                 
-                <div class="additional-info">
-                    <h3>💡 Need Help?</h3>
-                    <p>• Questions about the application? Email us at <a href="mailto:support@eduvision.live">support@eduvision.live</a></p>
-                    <p>• Browse more scholarships: <a href="https://eduvision.live/scholarships" target="_blank">EduVision Scholarships</a></p>
-                    <p>• Application tips and resources available on our website</p>
-                </div>
-                
-                <p style="margin-top: 32px;">Best of luck with your application!</p>
-                <p><strong>The EduVision Team</strong></p>
-            </div>
-            
-            <div class="footer">
-                <p>© {year} EduVision. All rights reserved.</p>
-                <p>Helping students find and secure educational funding worldwide.</p>
-                <p><a href="https://eduvision.live">Visit our website</a> | <a href="mailto:support@eduvision.live">Contact support</a></p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+""" + _FOOTER
+)
 
-    return html_body
+# Minified with the CSS inlined; see html_optimizer.py
+_html = optimize_template("template", CompiledTemplate(HTML_SOURCE, FIELDS))
 
 
-def template_plain_text(name, scholarship_name, friendly_deadline, apply_link, year):
-    text_body = f"""
+def template(name, scholarship_name, friendly_deadline, apply_link, year):
+    return _html.render(name, scholarship_name, friendly_deadline, apply_link, year)
+
+
+TEXT_SOURCE = """
     🎓 SCHOLARSHIP OPPORTUNITY: {scholarship_name}
 
     Hello {name}!
@@ -257,4 +276,122 @@ def template_plain_text(name, scholarship_name, friendly_deadline, apply_link, y
     © {year} EduVision. All rights reserved.
     """
 
-    return text_body
+_text = CompiledTemplate(TEXT_SOURCE, FIELDS)
+
+
+def template_plain_text(name, scholarship_name, friendly_deadline, apply_link, year):
+    return _text.render(name, scholarship_name, friendly_deadline, apply_link, year)
+
+
+def bind_scholarship(scholarship_name, friendly_deadline, apply_link, year):
+    # Pre-render everything except the recipient name; the returned HTML and
+    # text templates each render with render(name)
+    values = {
+        "scholarship_name": scholarship_name,
+        "friendly_deadline": friendly_deadline,
+        "apply_link": apply_link,
+        "year": year,
+    }
+    return _html.partial(**values), _text.partial(**values)
+
+
+# Digest: one email listing every scholarship a recipient has a row for. Each
+# scholarship is rendered from the item templates into the {scholarships} slot.
+DIGEST_ITEM_HTML_SOURCE = """
+                <div class="scholarship-info">
+                    <div class="scholarship-name">{scholarship_name}</div>
+                    
+                    <div class="deadline">
+                        Application Deadline: {friendly_deadline}
+                    </div>
+                    
+                    <div>
+                        <a href="{apply_link}" style="
+                            display: inline-block;
+                            background-color: #007bff;
+                            color: white;
+                            padding: 12px 24px;
+                            border-radius: 8px;
+                            text-decoration: none;
+                            font-weight: bold;
+                            font-size: 16px;
+                        ">🚀 Apply Now</a>
+                    </div>
+                </div>
+"""
+
+DIGEST_HTML_SOURCE = _DOCUMENT_START + "Scholarship Deadlines" + _HEADER + """
+                <div class="greeting">
+                    Greeting {name}! 👋
+                </div>
+                
+                <h3>🚨 Heads up! {scholarship_count} scholarship deadlines are coming up fast — here they are, soonest first.</h3>
+                {scholarships}
+                <p>Don't miss these opportunities to invest in your future. Click a button above to learn more and submit your application.</p>
+                
+""" + _FOOTER
+
+# The items are inlined against the page's stylesheet, since the rules they
+# use are inlined out of the page's <style> element
+_digest_item_html = optimize_template(
+    "digest_item",
+    CompiledTemplate(DIGEST_ITEM_HTML_SOURCE, DIGEST_ITEM_FIELDS),
+    stylesheet=CompiledTemplate(STYLE_SOURCE).render(),
+)
+_digest_html = optimize_template(
+    "digest", CompiledTemplate(DIGEST_HTML_SOURCE, DIGEST_FIELDS)
+)
+
+DIGEST_ITEM_TEXT_SOURCE = """
+    SCHOLARSHIP: {scholarship_name}
+    APPLICATION DEADLINE: {friendly_deadline}
+    APPLY NOW: {apply_link}
+"""
+
+DIGEST_TEXT_SOURCE = """
+    🎓 {scholarship_count} SCHOLARSHIP DEADLINES COMING UP
+
+    Hello {name}!
+
+    These scholarship deadlines are coming up fast, soonest first:
+{scholarships}
+    NEED HELP?
+    • Questions? Email: support@eduvision.live
+    • More scholarships: https://eduvision.live/scholarships
+
+    Best of luck with your applications!
+
+    The EduVision Team
+    © {year} EduVision. All rights reserved.
+    """
+
+_digest_item_text = CompiledTemplate(DIGEST_ITEM_TEXT_SOURCE, DIGEST_ITEM_FIELDS)
+_digest_text = CompiledTemplate(DIGEST_TEXT_SOURCE, DIGEST_FIELDS)
+
+
+def digest_template(name, scholarships, year):
+    # scholarships is a sequence of (scholarship_name, friendly_deadline,
+    # apply_link) tuples, in the order they are listed
+    items = "".join(_digest_item_html.render(*item) for item in scholarships)
+    return _digest_html.render(name, len(scholarships), items, year)
+
+
+def digest_plain_text(name, scholarships, year):
+    items = "".join(_digest_item_text.render(*item) for item in scholarships)
+    return _digest_text.render(name, len(scholarships), items, year)
+
+
+def bind_digest(scholarships, year):
+    # Same as bind_scholarship for a digest: the returned HTML and text
+    # templates each render with render(name)
+    html_items = "".join(_digest_item_html.render(*item) for item in scholarships)
+    text_items = "".join(_digest_item_text.render(*item) for item in scholarships)
+    count = len(scholarships)
+    return (
+        _digest_html.partial(
+            scholarship_count=count, scholarships=html_items, year=year
+        ),
+        _digest_text.partial(
+            scholarship_count=count, scholarships=text_items, year=year
+        ),
+    )